@@ -0,0 +1,133 @@
+"""Per-page parse time of the crawler and scraper parse stages, before and after.
+
+"before" is the original code path: a full html.parser tree searched with
+find_all. The other rows use html_parsing with each installed backend and
+the targeted parsing the pipeline now does.
+
+Usage:
+    python benchmarks/parse_benchmark.py saved_pages/
+    python benchmarks/parse_benchmark.py saved_pages/ --save-from sitemap_cleaned.xml --limit 100
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import html_parsing
+import http_client
+from page_extract import extract_page_content
+
+
+def save_pages(sitemap_file, directory, limit):
+    """Download up to limit HTML pages listed in sitemap_file into directory."""
+    from clean import iter_sitemap_entries
+
+    os.makedirs(directory, exist_ok=True)
+    saved = 0
+    for entry in iter_sitemap_entries(sitemap_file):
+        if saved >= limit:
+            break
+        response = http_client.fetch_html(entry["loc"])
+        if response is None:
+            continue
+        with response:
+            if response.status_code != 200:
+                continue
+            body = http_client.read_body(response)
+        with open(os.path.join(directory, f"page_{saved:05d}.html"), "wb") as file:
+            file.write(body)
+        saved += 1
+    print(f"Saved {saved} pages to {directory}")
+
+
+def load_pages(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "rb") as file:
+                pages.append(file.read().decode("utf-8", errors="replace"))
+    return pages
+
+
+def links_before(html):
+    soup = BeautifulSoup(html, "html.parser")
+    return [link["href"] for link in soup.find_all("a", href=True)]
+
+
+def content_before(html):
+    soup = BeautifulSoup(html, "html.parser")
+    text = "\n".join(p.get_text() for p in soup.find_all("p"))
+    tables = [[[cell.get_text(strip=True) for cell in tr.find_all(["th", "td"])]
+               for tr in table.find_all("tr")] for table in soup.find_all("table")]
+    pdf_links = [link["href"] for link in soup.find_all("a", href=True) if link["href"].endswith(".pdf")]
+    return text, tables, pdf_links
+
+
+def time_per_page(function, pages, repeat):
+    """Median over repeat runs of the mean seconds per page."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            function(html)
+        runs.append((time.perf_counter() - start) / len(pages))
+    return statistics.median(runs)
+
+
+def run(pages, repeat):
+    cases = [("links", "before", links_before), ("content", "before", content_before)]
+    for backend in html_parsing.available_backends():
+        cases.append(("links", backend, lambda html, b=backend: html_parsing.extract_links(html, b)))
+    for backend in html_parsing.available_backends():
+        if backend == "selectolax":
+            continue  # content extraction always goes through BeautifulSoup
+        def content(html, b=backend):
+            soup = html_parsing.make_soup(html, ["p", "table", "a"], b)
+            return soup.find_all("p"), soup.find_all("table"), soup.find_all("a", href=True)
+        cases.append(("content", backend, content))
+    cases.append(("content", "pipeline", lambda html: extract_page_content(html, "http://localhost/")))
+
+    results = []
+    for stage, backend, function in cases:
+        seconds = time_per_page(function, pages, repeat)
+        results.append({"stage": stage, "backend": backend, "ms_per_page": round(seconds * 1000, 3)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages_dir", help="directory of saved .html pages")
+    parser.add_argument("--save-from", metavar="SITEMAP", help="first download pages listed in this sitemap")
+    parser.add_argument("--limit", type=int, default=50, help="pages to download with --save-from")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the median is reported")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    if args.save_from:
+        save_pages(args.save_from, args.pages_dir, args.limit)
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        sys.exit(f"No .html files in {args.pages_dir}")
+
+    results = run(pages, args.repeat)
+    baseline = {r["stage"]: r["ms_per_page"] for r in results if r["backend"] == "before"}
+    print(f"{len(pages)} pages, median of {args.repeat} runs")
+    print(f"{'stage':<10}{'backend':<14}{'ms/page':>10}{'speedup':>10}")
+    for r in results:
+        speedup = baseline[r["stage"]] / r["ms_per_page"] if r["ms_per_page"] else float("inf")
+        r["speedup"] = round(speedup, 2)
+        print(f"{r['stage']:<10}{r['backend']:<14}{r['ms_per_page']:>10.3f}{speedup:>9.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"pages": len(pages), "repeat": args.repeat, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
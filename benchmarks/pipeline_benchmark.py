@@ -0,0 +1,262 @@
+"""Throughput, latency and memory of each pipeline stage against a local synthetic site.
+
+A SyntheticSite (see synthetic_site.py) is served from this process, and
+each stage runs in a fresh child process in a scratch directory, in
+order: crawl (main.crawl_website), clean (clean.remove_redundant_links),
+text-gen (text-gen.py main) and tree (tree.py text rendering), each
+reading the output of the one before. For every stage the wall time,
+items/s, MB/s, peak RSS and p50/p99 request latency are reported and
+saved as JSON, and two result files can be compared to catch regressions.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --pages 2000 --pdfs 50 --output after.json
+    python benchmarks/pipeline_benchmark.py --stages crawl --latency-ms 50 --error-rate 0.02
+    python benchmarks/pipeline_benchmark.py --compare before.json after.json
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from synthetic_site import SiteServer, add_site_arguments, site_config
+
+STAGES = ("crawl", "clean", "text-gen", "tree")
+# Metrics where a higher value is better; for the others lower is better.
+HIGHER_IS_BETTER = ("items_per_s", "mb_per_s")
+COMPARED = ("items_per_s", "mb_per_s", "p50_ms", "p99_ms", "peak_rss_mb")
+
+
+def crawl_stage(base_url, options):
+    import http_client
+    import metrics
+    from main import crawl_website
+    from sitemap_writer import SitemapWriter
+
+    http_client.configure(pool_size=options["workers"], max_per_host=options["workers"])
+    with SitemapWriter("sitemap.xml") as writer:
+        crawl_website(base_url, max_depth=options["depth"], max_workers=options["workers"],
+                      sink=writer, use_sitemaps=False)
+    return _counter_total(metrics, "pages_total"), _counter_total(metrics, "bytes_total")
+
+
+def clean_stage(base_url, options):
+    import metrics
+    from clean import remove_redundant_links
+
+    remove_redundant_links("sitemap.xml", "sitemap_cleaned.xml", "cleanup_log.txt")
+    return _counter_total(metrics, "sitemap_urls_total"), os.path.getsize("sitemap.xml")
+
+
+def text_gen_stage(base_url, options):
+    import metrics
+
+    spec = importlib.util.spec_from_file_location("text_gen", os.path.join(REPO_DIR, "text-gen.py"))
+    text_gen = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(text_gen)
+    text_gen.logger.setLevel(logging.WARNING)
+    try:
+        text_gen.main("sitemap_cleaned.xml", "final_output.txt")
+    finally:
+        text_gen.log_listener.stop()
+    items = _counter_total(metrics, "pages_total") + _counter_total(metrics, "pdfs_total")
+    return items, _counter_total(metrics, "bytes_total")
+
+
+def tree_stage(base_url, options):
+    import tree
+
+    trie = tree.build_trie("sitemap_cleaned.xml")
+    with open("folder_structure.txt", "w", encoding="utf-8") as file:
+        tree.render_text(trie, file, counts=True)
+    return trie.root.count, os.path.getsize("sitemap_cleaned.xml")
+
+
+STAGE_FUNCTIONS = {"crawl": crawl_stage, "clean": clean_stage, "text-gen": text_gen_stage, "tree": tree_stage}
+
+
+def _counter_total(metrics, name):
+    return sum(value for (counter, _), value in metrics.REGISTRY.snapshot()["counters"].items()
+               if counter == name)
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and its children, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _run_stage(stage, base_url, options, workdir, results):
+    """Child process entry point: run one stage in workdir and put its result on results."""
+    os.chdir(workdir)
+    import metrics
+
+    start = time.perf_counter()
+    try:
+        items, nbytes = STAGE_FUNCTIONS[stage](base_url, options)
+    except Exception as e:
+        results.put({"stage": stage, "error": f"{type(e).__name__}: {e}"})
+        raise
+    seconds = time.perf_counter() - start
+
+    snapshot = metrics.REGISTRY.snapshot()
+    latency = snapshot["histograms"].get(("http_latency_seconds", ()))
+    results.put({
+        "stage": stage,
+        "seconds": round(seconds, 3),
+        "items": items,
+        "mb": round(nbytes / 1e6, 3),
+        "items_per_s": round(items / seconds, 2) if seconds else None,
+        "mb_per_s": round(nbytes / 1e6 / seconds, 3) if seconds else None,
+        "p50_ms": _ms(latency and latency["p50"]),
+        "p99_ms": _ms(latency and latency["p99"]),
+        "peak_rss_mb": _peak_rss_mb(),
+        "counters": {f"{name}{_labels(labels)}": value for (name, labels), value in snapshot["counters"].items()},
+    })
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _labels(labels):
+    return "{" + ",".join(f"{name}={value}" for name, value in labels) + "}" if labels else ""
+
+
+def run_stages(base_url, stages, options):
+    """Run stages in order in a fresh scratch directory; returns {stage: result}."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workdir = tempfile.mkdtemp(prefix="pipeline-benchmark-")
+    try:
+        stage_results = {}
+        for stage in stages:
+            process = context.Process(target=_run_stage, args=(stage, base_url, options, workdir, results))
+            process.start()
+            result = results.get()
+            process.join()
+            if "error" in result:
+                raise RuntimeError(f"Stage {stage} failed: {result['error']}")
+            stage_results[stage] = result
+        return stage_results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(server, stages, options, repeat):
+    """Results of repeat runs, keeping for each stage the run with the median wall time."""
+    runs = [run_stages(server.base_url, stages, options) for _ in range(repeat)]
+    best = {}
+    for stage in stages:
+        stage_runs = sorted((run[stage] for run in runs), key=lambda result: result["seconds"])
+        best[stage] = stage_runs[len(stage_runs) // 2]
+        best[stage]["runs_seconds"] = [result["seconds"] for result in stage_runs]
+    return best
+
+
+def compare(baseline, current, tolerance):
+    """Print the change of each compared metric; returns the regressions found."""
+    regressions = []
+    if baseline.get("site") != current.get("site") or baseline.get("options") != current.get("options"):
+        print("Warning: the two runs used different site or benchmark settings")
+    print(f"{'stage':<10}{'metric':<14}{'baseline':>12}{'current':>12}{'change':>10}")
+    for stage, result in current["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old is None:
+            continue
+        for metric in COMPARED:
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append((stage, metric, before, after))
+            print(f"{stage:<10}{metric:<14}{before:>12}{after:>12}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'stage':<10}{'seconds':>9}{'items':>8}{'items/s':>10}{'MB/s':>9}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>9}")
+    for stage, r in results.items():
+        print(f"{stage:<10}{r['seconds']:>9.2f}{r['items']:>8}{r['items_per_s'] or 0:>10.1f}"
+              f"{r['mb_per_s'] or 0:>9.2f}{_cell(r['p50_ms'])}{_cell(r['p99_ms'])}{_cell(r['peak_rss_mb'])}")
+
+
+def _cell(value):
+    return f"{'-':>9}" if value is None else f"{value:>9.1f}"
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_site_arguments(parser)
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated stages to run, in order (default: {','.join(STAGES)})")
+    parser.add_argument("--workers", type=int, default=8, help="crawler workers and per-host limit")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the median run is reported")
+    parser.add_argument("--output", default="benchmark.json", help="JSON results file (default: benchmark.json)")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with an earlier results file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="only compare two results files")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative change counted as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(_load(args.compare[0]), _load(args.compare[1]), args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    config = site_config(args)
+    options = {"workers": args.workers, "depth": config.depth}
+    with SiteServer(config) as server:
+        print(f"Serving {server.site.page_count} pages and {config.pdfs} PDFs at {server.base_url}")
+        results = run(server, stages, options, args.repeat)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "site": config._asdict(),
+        "options": {**options, "repeat": args.repeat},
+        "stages": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print_results(results)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare(_load(args.baseline), report, args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Local HTTP server for a generated website, used by the pipeline benchmarks.
+
+The site is a tree of HTML pages: the home page links to fanout pages,
+each of those to fanout more, down to depth levels or until pages pages
+exist. Every page also links back home and to cross_links random pages
+(so the crawler sees duplicate links) and carries a table and page_kb of
+paragraph text; duplicate_rate of the pages repeat the text of an
+earlier page, like the login and search variants of real sites. Pages
+link to pdfs PDF files of pdf_kb each. Latency is injected per request,
+and error_rate of the page and PDF requests fail with error_status.
+Everything is generated from seed, so runs with the same settings serve
+the same site.
+
+Usage:
+    python benchmarks/synthetic_site.py --pages 2000 --fanout 8 --depth 4 --port 8000
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_PATH = re.compile(r"^/l(\d+)/p(\d+)\.html$")
+PDF_PATH = re.compile(r"^/files/doc(\d+)\.pdf$")
+WORDS = ("admission", "department", "research", "faculty", "student", "course", "laboratory",
+         "semester", "notice", "library", "hostel", "placement", "engineering", "science",
+         "schedule", "examination", "committee", "project", "seminar", "campus")
+
+
+SiteConfig = namedtuple(
+    "SiteConfig",
+    "pages fanout depth cross_links page_kb pdfs pdf_kb latency_ms jitter_ms error_rate error_status seed "
+    "duplicate_rate",
+    defaults=(500, 8, 3, 2, 8, 20, 64, 5.0, 2.0, 0.0, 500, 1, 0.0))
+
+
+class SyntheticSite:
+    """The generated site: page layout, page bodies and PDF bodies."""
+
+    def __init__(self, config):
+        self.config = config
+        # Pages are numbered breadth-first; level l holds ids offsets[l] to offsets[l + 1] - 1
+        self.offsets = [0]
+        remaining = config.pages
+        for level in range(config.depth + 1):
+            size = min(config.fanout ** level, remaining)
+            if size <= 0:
+                break
+            self.offsets.append(self.offsets[-1] + size)
+            remaining -= size
+        self.page_count = self.offsets[-1]
+
+    def page_path(self, page_id):
+        if page_id == 0:
+            return "/"
+        level = next(level for level in range(len(self.offsets) - 1) if page_id < self.offsets[level + 1])
+        return f"/l{level}/p{page_id - self.offsets[level]}.html"
+
+    def page_id(self, path):
+        """Page id for path, or None if path is not a page of the site."""
+        if path in ("/", "/index.html"):
+            return 0
+        match = PAGE_PATH.match(path)
+        if not match:
+            return None
+        level, index = int(match.group(1)), int(match.group(2))
+        if level + 1 >= len(self.offsets):
+            return None
+        page_id = self.offsets[level] + index
+        return page_id if page_id < self.offsets[level + 1] else None
+
+    def page_urls(self):
+        return [self.page_path(page_id) for page_id in range(self.page_count)]
+
+    def pdf_urls(self):
+        return [f"/files/doc{n}.pdf" for n in range(self.config.pdfs)]
+
+    def links(self, page_id):
+        """Paths linked from a page: its children, home, random pages and its PDFs."""
+        config = self.config
+        level = next(level for level in range(len(self.offsets) - 1) if page_id < self.offsets[level + 1])
+        links = []
+        if level + 2 < len(self.offsets):
+            first_child = self.offsets[level + 1] + (page_id - self.offsets[level]) * config.fanout
+            children = range(first_child, min(first_child + config.fanout, self.offsets[level + 2]))
+            links.extend(self.page_path(child) for child in children)
+        links.append("/")
+        rng = random.Random(f"{config.seed}:links:{page_id}")
+        links.extend(self.page_path(rng.randrange(self.page_count)) for _ in range(config.cross_links))
+        links.extend(f"/files/doc{n}.pdf" for n in range(page_id, config.pdfs, self.page_count))
+        return links
+
+    def page_body(self, page_id):
+        # duplicate_rate of the pages repeat the text of an earlier page
+        text_id = page_id
+        variant = random.Random(f"{self.config.seed}:duplicate:{page_id}")
+        if page_id and variant.random() < self.config.duplicate_rate:
+            text_id = variant.randrange(page_id)
+        rng = random.Random(f"{self.config.seed}:page:{text_id}")
+        parts = [f"<!DOCTYPE html><html><head><title>Page {page_id}</title></head><body>",
+                 f"<h1>Page {page_id}</h1><nav>"]
+        parts.extend(f'<a href="{path}">{path}</a> ' for path in self.links(page_id))
+        parts.append("</nav><table><tr><th>Item</th><th>Value</th></tr>")
+        parts.extend(f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.randrange(1000)}</td></tr>" for _ in range(5))
+        parts.append("</table>")
+        size = sum(len(part) for part in parts)
+        while size < self.config.page_kb * 1024:
+            paragraph = "<p>" + " ".join(rng.choice(WORDS) for _ in range(60)) + "</p>\n"
+            parts.append(paragraph)
+            size += len(paragraph)
+        parts.append("</body></html>")
+        return "".join(parts).encode("utf-8")
+
+    def pdf_body(self, number):
+        rng = random.Random(f"{self.config.seed}:pdf:{number}")
+        return build_pdf(f"Document {number}", rng, self.config.pdf_kb * 1024)
+
+
+def build_pdf(title, rng, size):
+    """A valid text PDF of roughly size bytes, one page per 50 lines of words."""
+    pages = []
+    written = 0
+    while written < size or not pages:
+        lines = [title] + [" ".join(rng.choice(WORDS) for _ in range(10)) for _ in range(49)]
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 50 780 Td {text} ET".encode("ascii")
+        pages.append(stream)
+        written += len(stream)
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for stream in pages:
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>"
+                       .encode("ascii"))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_handler(site):
+    config = site.config
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self._respond(send_body=True)
+
+        def do_HEAD(self):
+            self._respond(send_body=False)
+
+        def _respond(self, send_body):
+            path = self.path.split("?", 1)[0]
+            with rng_lock:
+                delay = max(0.0, rng.uniform(config.latency_ms - config.jitter_ms,
+                                             config.latency_ms + config.jitter_ms)) / 1000
+                failed = rng.random() < config.error_rate
+            time.sleep(delay)
+
+            if path == "/robots.txt":
+                return self._send(200, "text/plain", b"User-agent: *\nDisallow:\n", send_body)
+            if path == "/sitemap.xml":
+                return self._send(200, "application/xml", self._sitemap(), send_body)
+            page_id = site.page_id(path)
+            pdf_match = PDF_PATH.match(path)
+            if page_id is None and not (pdf_match and int(pdf_match.group(1)) < config.pdfs):
+                return self._send(404, "text/plain", b"not found", send_body)
+            if failed:
+                return self._send(config.error_status, "text/plain", b"injected error", send_body)
+            if page_id is not None:
+                return self._send(200, "text/html; charset=utf-8", site.page_body(page_id), send_body)
+            return self._send(200, "application/pdf", site.pdf_body(int(pdf_match.group(1))), send_body)
+
+        def _sitemap(self):
+            base = f"http://{self.headers.get('Host')}"
+            entries = "".join(f"<url><loc>{base}{path}</loc></url>" for path in site.page_urls())
+            return ('<?xml version="1.0" encoding="UTF-8"?>'
+                    f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+                    ).encode("utf-8")
+
+        def _send(self, status, content_type, body, send_body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class SiteServer:
+    """Serves a SyntheticSite from a background thread; use as a context manager."""
+
+    def __init__(self, config, host="127.0.0.1", port=0):
+        self.site = SyntheticSite(config)
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.site))
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="synthetic-site", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def add_site_arguments(parser):
+    defaults = SiteConfig()
+    parser.add_argument("--pages", type=int, default=defaults.pages, help="HTML pages on the site")
+    parser.add_argument("--fanout", type=int, default=defaults.fanout, help="child pages linked from each page")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="levels below the home page")
+    parser.add_argument("--cross-links", type=int, default=defaults.cross_links,
+                        help="extra links from each page to random pages")
+    parser.add_argument("--page-kb", type=int, default=defaults.page_kb, help="size of each page")
+    parser.add_argument("--pdfs", type=int, default=defaults.pdfs, help="PDF files on the site")
+    parser.add_argument("--pdf-kb", type=int, default=defaults.pdf_kb, help="size of each PDF")
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="mean response delay")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="spread of the response delay")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate,
+                        help="fraction of page and PDF requests that fail")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status,
+                        help="HTTP status of the failed requests")
+    parser.add_argument("--duplicate-rate", type=float, default=defaults.duplicate_rate,
+                        help="fraction of pages repeating the text of an earlier page")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def site_config(args):
+    return SiteConfig(**{name: getattr(args, name) for name in SiteConfig._fields})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_site_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    with SiteServer(site_config(args), args.host, args.port) as server:
+        print(f"Serving {server.site.page_count} pages and {args.pdfs} PDFs at {server.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
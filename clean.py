@@ -1,40 +1,87 @@
+import argparse
+import gzip
+import os
 import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+import metrics
+from sitemap_writer import SitemapWriter
+from url_utils import make_seen_set
 
 # File names
 input_file = "sitemap_fixed.xml"
 output_file = "sitemap_cleaned.xml"
 log_file = "cleanup_log.txt"
 
-def remove_redundant_links(input_file, output_file, log_file):
-    try:
-        tree = ET.parse(input_file)
-        root = tree.getroot()
-
-        namespace = "http://www.sitemaps.org/schemas/sitemap/0.9"
-        ET.register_namespace('', namespace)
-        seen_urls = set()
-        removed_urls = []
-        
-        for url_element in root.findall(f".//{{{namespace}}}url"):
-            loc_element = url_element.find(f"{{{namespace}}}loc")
-            if loc_element is not None:
-                url = loc_element.text.strip()
-                if url.lower() in seen_urls:
-                    root.remove(url_element)
-                    removed_urls.append(url)
-                else:
-                    seen_urls.add(url.lower())
+namespace = "http://www.sitemaps.org/schemas/sitemap/0.9"
+URL_TAG = f"{{{namespace}}}url"
+SITEMAP_TAG = f"{{{namespace}}}sitemap"
+
+
+def open_sitemap(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def iter_sitemap_elements(file, strip=True):
+    """Yield ("url" or "sitemap", child values) for each entry of a sitemap file object.
+
+    The file is parsed incrementally and each element is discarded once it has
+    been read, so memory does not grow with the file. With strip=False the
+    values are kept exactly as written, surrounding whitespace included.
+    """
+    context = ET.iterparse(file, events=("start", "end"))
+    _, root = next(context)
+    for event, element in context:
+        if event != "end" or element.tag not in (URL_TAG, SITEMAP_TAG):
+            continue
+        values = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() if strip else child.text or ""
+                  for child in element}
+        root.clear()
+        yield ("url" if element.tag == URL_TAG else "sitemap"), values
+
 
-        tree.write(output_file, encoding="UTF-8", xml_declaration=True)
+def iter_sitemap_entries(path, strip=True):
+    """Yield a dict of the child values (loc, lastmod, ...) of every <url> in path.
 
-        with open(log_file, "w") as log:
+    Gzipped files are read transparently, and for a sitemap index the listed
+    sitemaps are read in turn from the same directory.
+    """
+    with open_sitemap(path) as file:
+        for kind, values in iter_sitemap_elements(file, strip):
+            if kind == "url":
+                yield values
+            elif values.get("loc", "").strip():
+                child_name = os.path.basename(urlparse(values["loc"].strip()).path)
+                yield from iter_sitemap_entries(os.path.join(os.path.dirname(path), child_name), strip)
+
+
+def remove_redundant_links(input_file, output_file, log_file, seen_set="fingerprint"):
+    try:
+        gzip_output = output_file.endswith(".gz")
+        sitemap_name = output_file[:-len(".gz")] if gzip_output else output_file
+        seen_urls = make_seen_set(seen_set)
+        removed_count = 0
+
+        with open(log_file, "w") as log, SitemapWriter(sitemap_name, gzip_output=gzip_output) as writer, \
+                metrics.timer("stage_seconds", stage="clean"):
             log.write("Sitemap Cleanup Log\n")
             log.write(f"Input file: {input_file}\n")
             log.write(f"Output file: {output_file}\n")
             log.write("Removed URLs:\n")
-            for url in removed_urls:
-                log.write(f"- {url}\n")
-            log.write(f"Total removed: {len(removed_urls)}\n")
+
+            for entry in iter_sitemap_entries(input_file):
+                url = entry.get("loc")
+                if not url:
+                    continue
+                if not seen_urls.add(url.lower()):
+                    log.write(f"- {url}\n")
+                    removed_count += 1
+                    metrics.count("sitemap_urls_total", result="removed")
+                else:
+                    metrics.count("sitemap_urls_total", result="kept")
+                    writer.add(url, entry.get("lastmod"), entry.get("changefreq"), entry.get("priority"))
+
+            log.write(f"Total removed: {removed_count}\n")
 
         print("Cleanup completed successfully. Check the log file for details.")
 
@@ -42,4 +89,23 @@ def remove_redundant_links(input_file, output_file, log_file):
         print(f"Error parsing {input_file}: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-remove_redundant_links(input_file, output_file, log_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove case-insensitive duplicate URLs from a sitemap.")
+    parser.add_argument("input_file", nargs="?", default=input_file,
+                        help="sitemap or sitemap index, optionally gzipped")
+    parser.add_argument("output_file", nargs="?", default=output_file,
+                        help="cleaned sitemap (a .gz name writes gzipped output)")
+    parser.add_argument("--log", default=log_file, help="cleanup log file")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the metrics to FILE (JSON for *.json, Prometheus text otherwise)")
+    parser.add_argument("--metrics-interval", type=float, default=30,
+                        help="print a metrics summary every this many seconds, 0 for only the final one "
+                             "(default: 30)")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and save the stats to FILE")
+    args = parser.parse_args()
+    with metrics.profiled(args.profile), metrics.Reporter(args.metrics_interval):
+        remove_redundant_links(args.input_file, args.output_file, args.log)
+    if args.metrics:
+        metrics.dump(args.metrics)
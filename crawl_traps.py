@@ -0,0 +1,144 @@
+"""Crawl-trap detection for the link crawler.
+
+Calendars, search results, session parameters and CMS action links
+(+login, +login&subaction=register, ...) can generate endless URLs. Each
+new URL is classified into a path template, with numbers, dates and IDs
+collapsed and parameter values dropped:
+
+    /events/2024-05-01/page3?sid=9f2c&sort=asc  ->  /events/{date}/page{n}?sid&sort
+
+and a URL is skipped when its template, or one of its parameters, has
+used up its budget, when its path repeats the same segments, or when its
+path is implausibly deep. check() returns the reason for a skip so it can
+be counted and reported.
+"""
+import re
+from collections import Counter, namedtuple
+from urllib.parse import parse_qsl, urlsplit
+
+# Budgets and limits for one site's crawl.
+#   template_budget: URLs admitted per path template
+#   parameter_budget: URLs admitted per query parameter of a path, across all
+#       the templates combining it with other parameters. It is no smaller than
+#       template_budget, so a plain listing like news.php?id gets the whole
+#       template budget.
+#   max_repeats: times one path segment may occur in a path
+#   max_path_depth: path segments in a URL
+#   path_parameter_budget: URLs admitted per path parameter (+action or
+#       name=value segment) anywhere on the site
+TrapLimits = namedtuple("TrapLimits",
+                        "template_budget parameter_budget max_repeats max_path_depth path_parameter_budget",
+                        defaults=(1000, 1000, 2, 15, 100))
+
+# Skip reasons, also used as metric labels.
+REPEATING_SEGMENTS = "repeating_segments"
+PATH_DEPTH = "path_depth"
+TEMPLATE_BUDGET = "template_budget"
+PARAMETER_BUDGET = "parameter_budget"
+
+MAX_REPORTED = 1000  # distinct (reason, template) pairs kept for the report
+
+DATE = re.compile(r"^\d{4}[-_/]?\d{1,2}([-_/]?\d{1,2})?$")
+HEX_ID = re.compile(r"^(?=.*\d)[0-9a-f]{8,}$|^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+TOKEN = re.compile(r"^(?=.*\d)(?=.*[a-z])[0-9a-z_-]{20,}$")
+DIGITS = re.compile(r"\d+")
+
+
+def segment_template(segment):
+    """Segment with its variable parts collapsed."""
+    lowered = segment.lower()
+    if lowered.isdigit():
+        return "{n}"
+    if DATE.match(lowered):
+        return "{date}"
+    if HEX_ID.match(lowered) or TOKEN.match(lowered):
+        return "{id}"
+    if "&" in segment or "=" in segment:
+        # Path parameters like +login&subaction=register keep only the names
+        return "&".join(part.split("=", 1)[0] for part in segment.split("&"))
+    return DIGITS.sub("{n}", segment)
+
+
+def path_parameters(segments):
+    """Names of the parameters carried in path segments: +actions and name=value parts."""
+    names = []
+    for segment in segments:
+        for part in segment.split("&"):
+            if part.startswith("+") or "=" in part:
+                names.append(part.split("=", 1)[0])
+    return names
+
+
+class TrapDetector:
+    """Admits or rejects the new URLs of one site's crawl. Not thread-safe;
+    the crawler calls it from its coordinating thread only."""
+
+    def __init__(self, limits=TrapLimits()):
+        self.limits = limits
+        self._templates = Counter()
+        self._parameters = Counter()
+        self.skipped = Counter()  # reason -> URLs skipped
+        self._examples = Counter()  # (reason, template) -> URLs skipped
+
+    def template(self, url):
+        parts = urlsplit(url)
+        segments = [segment for segment in parts.path.split("/") if segment]
+        path = "/" + "/".join(segment_template(segment) for segment in segments)
+        names = sorted({name for name, _ in parse_qsl(parts.query, keep_blank_values=True)})
+        return path + ("?" + "&".join(names) if names else "")
+
+    def check(self, url):
+        """Reason to skip url, or None, in which case url counts against its budgets.
+
+        Call this once per new URL; URLs seen before should not be checked again.
+        """
+        parts = urlsplit(url)
+        segments = [segment for segment in parts.path.split("/") if segment]
+        template = self.template(url)
+        path_template = template.split("?", 1)[0]
+
+        reason = None
+        if len(segments) > self.limits.max_path_depth:
+            reason = PATH_DEPTH
+        elif _repeats(segments) > self.limits.max_repeats:
+            reason = REPEATING_SEGMENTS
+        elif self._templates[template] >= self.limits.template_budget:
+            reason = TEMPLATE_BUDGET
+        else:
+            parameters = [("path", name) for name in path_parameters(segments)]
+            parameters += [(path_template, name)
+                           for name in {name for name, _ in parse_qsl(parts.query, keep_blank_values=True)}]
+            exhausted = [parameter for parameter in parameters
+                         if self._parameters[parameter] >= self._budget(parameter)]
+            if exhausted:
+                reason = PARAMETER_BUDGET
+                scope, name = exhausted[0]
+                template = f"{name} (any path)" if scope == "path" else f"{scope}?{name}"
+            else:
+                self._templates[template] += 1
+                self._parameters.update(parameters)
+                return None
+
+        self.skipped[reason] += 1
+        if (reason, template) in self._examples or len(self._examples) < MAX_REPORTED:
+            self._examples[reason, template] += 1
+        return reason
+
+    def _budget(self, parameter):
+        scope, _ = parameter
+        return self.limits.path_parameter_budget if scope == "path" else self.limits.parameter_budget
+
+    def report(self, top=10):
+        """Lines summarizing the skipped URLs by reason and template, most frequent first."""
+        if not self.skipped:
+            return []
+        lines = [f"  {sum(self.skipped.values())} URLs skipped: "
+                 + ", ".join(f"{reason} {count}" for reason, count in self.skipped.most_common())]
+        for (reason, template), count in self._examples.most_common(top):
+            lines.append(f"  {count:>7}  {reason:<18} {template}")
+        return lines
+
+
+def _repeats(segments):
+    """Most times one segment occurs in the path (a repeated run repeats each of its segments)."""
+    return max(Counter(segments).values(), default=0)
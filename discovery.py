@@ -0,0 +1,113 @@
+"""Seed a crawl from robots.txt and the sitemaps a site already publishes.
+
+The sitemaps listed in robots.txt (or /sitemap.xml when it lists none) are
+streamed and parsed incrementally, following sitemap indexes, so even very
+large published sitemaps are never held in memory. robots.txt is also used
+to keep the crawler away from disallowed paths.
+"""
+import gzip
+import io
+import logging
+import xml.etree.ElementTree as ET
+from collections import deque
+from urllib.parse import urljoin
+
+import requests
+
+import http_client
+from clean import iter_sitemap_elements
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SITEMAP_PATHS = ("/sitemap.xml",)
+MAX_SITEMAPS = 1000  # sitemap files read per site, including nested indexes
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def allowed(url):
+    """True if robots.txt lets this crawler fetch url."""
+    return http_client.robots(url).can_fetch(http_client.USER_AGENT, url)
+
+
+def published_sitemaps(base_url):
+    """Sitemap URLs announced in robots.txt, or the conventional locations if there are none."""
+    sitemaps = http_client.robots(base_url).site_maps()
+    if sitemaps:
+        return sitemaps
+    return [urljoin(base_url, path) for path in DEFAULT_SITEMAP_PATHS]
+
+
+def iter_remote_sitemap(url):
+    """Yield ("url" or "sitemap", child values) for each entry of the sitemap at url.
+
+    The body is parsed while it downloads. Gzipped sitemaps are detected by
+    their magic bytes. Missing sitemaps yield nothing.
+    """
+    try:
+        response = http_client.get(url, stream=True)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not fetch sitemap {url}: {e}")
+        return
+    with response:
+        if response.status_code != 200:
+            logger.info(f"No sitemap at {url} (HTTP {response.status_code})")
+            return
+        body = io.BufferedReader(_ChunkReader(response.iter_content(64 * 1024)))
+        if body.peek(2)[:2] == GZIP_MAGIC:
+            body = gzip.GzipFile(fileobj=body)
+        try:
+            yield from iter_sitemap_elements(body)
+        except (ET.ParseError, OSError, EOFError) as e:
+            logger.warning(f"Stopped reading sitemap {url}: {e}")
+
+
+class _ChunkReader(io.RawIOBase):
+    """Readable file over an iterator of byte chunks, such as Response.iter_content()."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def discover(base_url, max_sitemaps=MAX_SITEMAPS):
+    """Yield (url, lastmod) for every page listed in the site's published sitemaps.
+
+    Sitemap indexes are followed breadth-first, each sitemap file is read
+    once, and at most max_sitemaps files are fetched. lastmod is passed
+    through as written in the sitemap, or None.
+    """
+    queue = deque(published_sitemaps(base_url))
+    seen = set(queue)
+    fetched = listed = 0
+    while queue and fetched < max_sitemaps:
+        sitemap_url = queue.popleft()
+        fetched += 1
+        for kind, values in iter_remote_sitemap(sitemap_url):
+            loc = values.get("loc")
+            if not loc:
+                continue
+            if kind == "sitemap":
+                loc = urljoin(sitemap_url, loc)
+                if loc not in seen:
+                    seen.add(loc)
+                    queue.append(loc)
+            else:
+                listed += 1
+                yield loc, values.get("lastmod") or None
+    if queue:
+        logger.warning(f"Read only the first {max_sitemaps} sitemaps of {base_url}")
+    logger.info(f"Found {listed} URLs in {fetched} published sitemaps of {base_url}")
@@ -0,0 +1,262 @@
+"""Crawl frontier and visited store.
+
+MemoryFrontier keeps everything in RAM. SQLiteFrontier keeps the frontier,
+the visited URLs and the recorded sitemap in an SQLite database in WAL
+mode, so a crawl can be resumed after a crash or Ctrl-C, and only the
+URLs currently being fetched are held in memory. It also remembers the
+validators, content hash and links of every fetched page across runs, so
+the next crawl can use conditional GETs.
+"""
+import sqlite3
+from collections import defaultdict, deque, namedtuple
+
+import url_utils
+
+PENDING, IN_PROGRESS, DONE = 0, 1, 2
+
+# What is known about a page from the last time it was fetched.
+PageState = namedtuple("PageState", "etag last_modified content_hash lastmod links")
+
+
+class MemoryFrontier:
+    def __init__(self, seen_set="exact", keep_sitemap=True):
+        self._visited = url_utils.make_seen_set(seen_set)
+        self._recorded = url_utils.make_seen_set(seen_set)
+        self._queues = defaultdict(deque)
+        self._open = set()
+        self._claimed = {}
+        self._sitemap = set() if keep_sitemap else None
+        self._lastmods = {}
+
+    def add(self, url, key, depth):
+        """Queue url at depth unless key was queued before. Returns True if queued."""
+        if not self._visited.add(key):
+            return False
+        self._queues[depth].append((url, key))
+        self._open.add(key)
+        return True
+
+    def record(self, url, key):
+        """Record url in the sitemap unless key was recorded before."""
+        if not self._recorded.add(key):
+            return False
+        if self._sitemap is not None:
+            self._sitemap.add(url)
+        return True
+
+    def seed(self, url, key, lastmod=None):
+        """Record url with the lastmod a published sitemap gives for it.
+        Returns True if it was not recorded before."""
+        if not self.record(url, key):
+            return False
+        if lastmod:
+            self._lastmods[key] = lastmod
+        return True
+
+    def published_lastmod(self, key):
+        """lastmod of a seeded URL, or None."""
+        return self._lastmods.get(key)
+
+    def is_open(self, key):
+        """True while key is queued or being fetched."""
+        return key in self._open
+
+    def is_recorded(self, key):
+        return key in self._recorded
+
+    def claim(self, depth, limit):
+        """Take up to limit queued URLs at depth for fetching."""
+        queue = self._queues[depth]
+        claimed = [queue.popleft() for _ in range(min(limit, len(queue)))]
+        self._claimed.update(claimed)
+        return [url for url, _ in claimed]
+
+    def complete(self, url):
+        self._open.discard(self._claimed.pop(url))
+
+    def page_state(self, url):
+        """PageState of url from a previous crawl, or None."""
+        return None
+
+    def save_page(self, url, state):
+        pass
+
+    def sitemap(self):
+        return iter(self._sitemap or ())
+
+    def finished_entries(self):
+        """(url, lastmod) of recorded URLs that will not be fetched again."""
+        return iter(())
+
+    def close(self):
+        pass
+
+
+class SQLiteFrontier:
+    """Frontier persisted in SQLite.
+
+    Writes are committed every batch_size operations, so a crash re-fetches
+    at most one batch of pages. URLs claimed but not completed when the
+    process died are put back in the queue on resume.
+    """
+
+    def __init__(self, path, base_url, resume=False, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending_writes = 0
+        self._claimed = {}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+        stored_base = self._get_meta("base_url")
+        if resume and stored_base not in (None, base_url):
+            self.conn.close()
+            raise ValueError(f"{path} holds a crawl of {stored_base}, not {base_url}")
+        if resume:
+            self.conn.execute("UPDATE frontier SET state = ? WHERE state = ?", (PENDING, IN_PROGRESS))
+        else:
+            self.conn.execute("DELETE FROM frontier")
+            self.conn.execute("DELETE FROM sitemap")
+        self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('base_url', ?)", (base_url,))
+        self.conn.commit()
+
+    def _create_tables(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS frontier_by_state ON frontier (state, depth);
+            CREATE TABLE IF NOT EXISTS sitemap (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                lastmod TEXT
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                lastmod TEXT,
+                links TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(sitemap)")]
+        if "lastmod" not in columns:  # state files from before seeding
+            self.conn.execute("ALTER TABLE sitemap ADD COLUMN lastmod TEXT")
+
+    def _get_meta(self, name):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _wrote(self):
+        self._pending_writes += 1
+        if self._pending_writes >= self.batch_size:
+            self.flush()
+
+    def add(self, url, key, depth):
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO frontier (key, url, depth, state) VALUES (?, ?, ?, ?)",
+            (key, url, depth, PENDING))
+        if cursor.rowcount:
+            self._wrote()
+        return cursor.rowcount == 1
+
+    def record(self, url, key):
+        cursor = self.conn.execute("INSERT OR IGNORE INTO sitemap (key, url) VALUES (?, ?)", (key, url))
+        if cursor.rowcount:
+            self._wrote()
+        return cursor.rowcount == 1
+
+    def seed(self, url, key, lastmod=None):
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO sitemap (key, url, lastmod) VALUES (?, ?, ?)", (key, url, lastmod))
+        if cursor.rowcount:
+            self._wrote()
+        return cursor.rowcount == 1
+
+    def published_lastmod(self, key):
+        row = self.conn.execute("SELECT lastmod FROM sitemap WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def claim(self, depth, limit):
+        if limit <= 0:
+            return []
+        rows = self.conn.execute(
+            "SELECT key, url FROM frontier WHERE state = ? AND depth = ? LIMIT ?",
+            (PENDING, depth, limit)).fetchall()
+        self.conn.executemany("UPDATE frontier SET state = ? WHERE key = ?",
+                              [(IN_PROGRESS, key) for key, _ in rows])
+        self._claimed.update((url, key) for key, url in rows)
+        return [url for _, url in rows]
+
+    def complete(self, url):
+        key = self._claimed.pop(url)
+        self.conn.execute("UPDATE frontier SET state = ? WHERE key = ?", (DONE, key))
+        self._wrote()
+
+    def is_open(self, key):
+        row = self.conn.execute("SELECT state FROM frontier WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] != DONE
+
+    def is_recorded(self, key):
+        return self.conn.execute("SELECT 1 FROM sitemap WHERE key = ?", (key,)).fetchone() is not None
+
+    def page_state(self, url):
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, lastmod, links FROM pages WHERE url = ?",
+            (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, content_hash, lastmod, links = row
+        return PageState(etag, last_modified, content_hash, lastmod, links.split("\n") if links else [])
+
+    def save_page(self, url, state):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, lastmod, links) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, state.etag, state.last_modified, state.content_hash, state.lastmod,
+             "\n".join(state.links)))
+        self._wrote()
+
+    def sitemap(self):
+        self.flush()
+        return (url for (url,) in self.conn.execute("SELECT url FROM sitemap"))
+
+    def finished_entries(self):
+        self.flush()
+        return self.conn.execute("""
+            SELECT sitemap.url, COALESCE(sitemap.lastmod, pages.lastmod) FROM sitemap
+            LEFT JOIN frontier ON frontier.key = sitemap.key
+            LEFT JOIN pages ON pages.url = sitemap.url
+            WHERE frontier.state IS NULL OR frontier.state = ?
+        """, (DONE,))
+
+    def flush(self):
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def open_frontier(state_file=None, base_url=None, resume=False, seen_set="exact", keep_sitemap=True):
+    """Persistent frontier when state_file is given, in-memory otherwise.
+
+    seen_set only applies to the in-memory frontier; the SQLite frontier
+    keeps its visited set on disk.
+    """
+    if state_file:
+        if seen_set != "exact":
+            raise ValueError(f"seen_set {seen_set!r} only applies without a state file")
+        return SQLiteFrontier(state_file, base_url, resume=resume)
+    return MemoryFrontier(seen_set, keep_sitemap=keep_sitemap)
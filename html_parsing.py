@@ -0,0 +1,64 @@
+"""HTML parsing backends.
+
+Picks the fastest parser that is installed: selectolax for link
+extraction, lxml for BeautifulSoup, and html.parser as the fallback. Every
+stage only builds the part of the tree it needs: the crawler only looks at
+<a href>, and the scrapers restrict BeautifulSoup to the tags they read.
+"""
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    SOUP_FEATURES = "lxml"
+except ImportError:
+    SOUP_FEATURES = "html.parser"
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser  # selectolax < 1.0
+    except ImportError:
+        HTMLParser = None
+
+BACKENDS = ("selectolax", "lxml", "html.parser")
+
+
+def available_backends():
+    backends = ["html.parser"]
+    if SOUP_FEATURES == "lxml":
+        backends.insert(0, "lxml")
+    if HTMLParser is not None:
+        backends.insert(0, "selectolax")
+    return backends
+
+
+def default_backend():
+    return available_backends()[0]
+
+
+def extract_links(html, backend=None):
+    """Return the href of every <a href> in html, in document order."""
+    backend = backend or default_backend()
+    if backend == "selectolax":
+        if HTMLParser is None:
+            raise ValueError("selectolax is not installed")
+        return [node.attributes.get("href") or "" for node in HTMLParser(html).css("a[href]")]
+
+    soup = make_soup(html, SoupStrainer("a", href=True), backend)
+    return [link["href"] for link in soup.find_all("a", href=True)]
+
+
+def make_soup(html, parse_only=None, backend=None):
+    """BeautifulSoup tree of html, limited to parse_only (a SoupStrainer or tag names).
+
+    Elements matching the strainer are kept with their whole subtree, so
+    nested matches (a <p> inside a <table>) are still found.
+    """
+    backend = backend or default_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    features = SOUP_FEATURES if backend in ("lxml", "selectolax") else "html.parser"
+    if parse_only is not None and not isinstance(parse_only, SoupStrainer):
+        parse_only = SoupStrainer(parse_only)
+    return BeautifulSoup(html, features, parse_only=parse_only)
@@ -0,0 +1,542 @@
+"""Shared HTTP client used by the crawler and the scrapers.
+
+All entry points fetch through one pooled requests.Session so connections
+are kept alive between requests, every request has a timeout, and
+dropped connections and 5xx responses are retried with backoff.
+
+Requests also go through a shared rate_limiter.RateLimiter, which adapts
+each host's concurrency and request rate to its latency, 429/503
+responses and robots.txt Crawl-delay. Throttled requests are retried
+here, after the limiter's backoff or the server's Retry-After.
+
+Bodies are read as streams and capped per content type (max_bytes), so
+memory use does not depend on what a server sends: a download is dropped
+as soon as its Content-Length or the bytes received pass the cap, or its
+Content-Type is not one the caller expects, and download() spools bodies
+larger than spool_threshold to a temporary file instead of keeping them
+in memory.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import ExitStack
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+
+import metrics
+from rate_limiter import THROTTLE_STATUSES, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+# Retried by the connection pool. 429 and 503 are left to the rate limiter.
+RETRY_STATUSES = (500, 502, 504)
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+PDF_CONTENT_TYPES = ("application/pdf", "application/x-pdf", "application/octet-stream", "binary/octet-stream")
+# Largest body read per content type; "*" applies to all other types.
+DEFAULT_MAX_BYTES = {
+    "text/html": 10 * 1024 ** 2,
+    "application/xhtml+xml": 10 * 1024 ** 2,
+    "application/pdf": 200 * 1024 ** 2,
+    "*": 50 * 1024 ** 2,
+}
+SPOOL_THRESHOLD = 8 * 1024 ** 2  # larger downloads are written to a temporary file
+CHUNK_SIZE = 64 * 1024
+# Extensions that are never HTML; URLs ending in these are not downloaded.
+NON_HTML_EXTENSIONS = frozenset({
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".rtf",
+    ".jpg", ".jpeg", ".png", ".gif", ".bmp", ".svg", ".webp", ".ico", ".tif", ".tiff",
+    ".zip", ".rar", ".7z", ".gz", ".tar", ".tgz", ".exe", ".apk", ".dmg", ".iso",
+    ".mp3", ".mp4", ".avi", ".mov", ".wmv", ".mkv", ".webm", ".wav", ".flv",
+    ".css", ".js", ".json", ".xml", ".txt", ".csv", ".woff", ".woff2", ".ttf", ".eot",
+})
+USER_AGENT = "Sitemap_Generator/1.0 (+https://github.com/AritraDey-Dev/-Sitemap_Generator_beautifulSoup)"
+
+_settings = {
+    "pool_size": 10,
+    "timeout": DEFAULT_TIMEOUT,
+    "retries": 3,
+    "backoff_factor": 0.5,
+    "http2": False,
+    "max_per_host": 8,
+    "adaptive": True,
+    "crawl_delay": True,
+    "max_bytes": DEFAULT_MAX_BYTES,
+    "spool_threshold": SPOOL_THRESHOLD,
+}
+_session = None
+_session_lock = threading.Lock()
+_limiter = None
+_robots = {}
+_robots_lock = threading.Lock()
+
+
+def configure(**options):
+    """Change client settings (pool_size, timeout, retries, backoff_factor, http2,
+    max_per_host, adaptive, crawl_delay, max_bytes, spool_threshold).
+
+    max_bytes maps content types to byte caps and is merged into the
+    current caps.
+
+    The shared session and rate limiter are rebuilt on next use, so call
+    this before starting workers, typically with pool_size set to the
+    number of worker threads.
+    """
+    global _session, _limiter
+    unknown = set(options) - set(_settings)
+    if unknown:
+        raise TypeError(f"Unknown client options: {', '.join(sorted(unknown))}")
+    with _session_lock:
+        if "max_bytes" in options:
+            options["max_bytes"] = {**_settings["max_bytes"], **options["max_bytes"]}
+        _settings.update(options)
+        if _session is not None:
+            _session.close()
+            _session = None
+        _limiter = None
+
+
+def get_session():
+    """Return the shared session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session(_settings["pool_size"], _settings["timeout"], _settings["retries"],
+                                      _settings["backoff_factor"], _settings["http2"])
+        return _session
+
+
+def get_limiter():
+    """Return the shared rate limiter, creating it on first use."""
+    global _limiter
+    with _session_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(max_concurrency=_settings["max_per_host"], adaptive=_settings["adaptive"])
+        return _limiter
+
+
+def rates():
+    """Current concurrency limit, request interval and latency per host."""
+    return get_limiter().snapshot()
+
+
+def create_session(pool_size=10, timeout=DEFAULT_TIMEOUT, retries=3, backoff_factor=0.5, http2=False):
+    """Build a session with a keep-alive pool of pool_size connections per host."""
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+
+    if http2:
+        adapter = _http2_adapter(pool_size, timeout, retries, backoff_factor)
+        if adapter is not None:
+            session.mount("https://", adapter)
+            session.mount("http://", _http_adapter(pool_size, retries, backoff_factor))
+            return session
+
+    adapter = _http_adapter(pool_size, retries, backoff_factor)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get(url, **kwargs):
+    """GET url through the shared session, applying the configured timeout."""
+    return request("GET", url, **kwargs)
+
+
+def head(url, **kwargs):
+    """HEAD url through the shared session, following redirects."""
+    kwargs.setdefault("allow_redirects", True)
+    return request("HEAD", url, **kwargs)
+
+
+def request(method, url, **kwargs):
+    """Send a request within its host's rate limit, retrying 429 and 503 responses.
+
+    A streamed response (stream=True) holds its slot until it is closed or
+    its body has been read through iter_body, so close it, or use it as a
+    context manager, when done.
+    """
+    kwargs.setdefault("timeout", _settings["timeout"])
+    session = get_session()
+    limiter = get_limiter()
+    if _settings["crawl_delay"]:
+        _apply_crawl_delay(limiter, url)
+
+    for attempt in range(_settings["retries"] + 1):
+        with ExitStack() as slot:
+            permit = slot.enter_context(limiter.slot(url))
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                metrics.count("http_errors_total", error=type(e).__name__)
+                raise
+            permit.observe(response)
+            if kwargs.get("stream"):
+                _hold_slot(response, slot.pop_all())
+        metrics.count("http_responses_total", status=f"{response.status_code // 100}xx")
+        metrics.observe("http_latency_seconds", response.elapsed.total_seconds())
+        if response.status_code not in THROTTLE_STATUSES or attempt == _settings["retries"]:
+            return response
+        logger.debug(f"{response.status_code} from {url}, retrying after backoff")
+        response.close()
+
+
+def _hold_slot(response, slot):
+    """Keep the rate limiter slot of a streamed response until the response
+    is closed, since its body is still to be read."""
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            slot.close()
+
+    response.close = close_and_release
+
+
+def robots(url):
+    """Parsed robots.txt of url's site, fetched once per site and cached."""
+    parts = urlparse(url)
+    robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+    with _robots_lock:
+        pending = _robots.get(robots_url)
+        if pending is None:
+            _robots[robots_url] = future = Future()
+    if pending is not None:
+        return pending.result()
+
+    parser = RobotFileParser(robots_url)
+    try:
+        # Sent outside the rate limiter: the limiter needs this file's Crawl-delay first
+        response = get_session().get(robots_url, timeout=_settings["timeout"])
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif response.ok:
+            parser.parse(response.text.splitlines())
+        else:
+            parser.allow_all = True
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not fetch {robots_url}: {e}")
+        parser.allow_all = True
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    future.set_result(parser)
+    return parser
+
+
+def crawl_delay(url):
+    """Seconds robots.txt asks between requests to url's site (Crawl-delay or Request-rate)."""
+    parser = robots(url)
+    delay = parser.crawl_delay(USER_AGENT) or 0
+    rate = parser.request_rate(USER_AGENT)
+    if rate and rate.requests:
+        delay = max(delay, rate.seconds / rate.requests)
+    return float(delay)
+
+
+def _apply_crawl_delay(limiter, url):
+    if limiter.host(url).crawl_delay_known:
+        return
+    delay = crawl_delay(url)
+    if delay:
+        logger.info(f"Using robots.txt Crawl-delay of {delay}s for {urlparse(url).netloc}")
+    limiter.set_crawl_delay(url, delay)
+
+
+def looks_like_html(url):
+    """Guess from the URL's extension whether it can be an HTML page."""
+    extension = os.path.splitext(urlparse(url).path)[1].lower()
+    return extension not in NON_HTML_EXTENSIONS
+
+
+def is_html_response(response):
+    page_type = content_type(response)
+    # Servers that send no Content-Type at all are usually serving pages.
+    return not page_type or page_type in HTML_CONTENT_TYPES
+
+
+def fetch_html(url, check_head=False, **kwargs):
+    """GET url only if it serves HTML, otherwise return None.
+
+    URLs with a known binary extension are skipped without any request. With
+    check_head, a HEAD request is sent first. The GET itself is streamed, so
+    for a non-HTML response only the headers are read and the body is dropped
+    by closing the connection.
+    """
+    if not looks_like_html(url):
+        return None
+    if check_head:
+        try:
+            response = head(url)
+            if response.ok and not is_html_response(response):
+                return None
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"HEAD failed for {url}, falling back to GET: {e}")
+
+    response = get(url, stream=True, **kwargs)
+    if not is_html_response(response):
+        response.close()
+        return None
+    return response
+
+
+class BodyTooLarge(requests.exceptions.RequestException):
+    """The response body is larger than the cap for its content type."""
+
+
+class UnexpectedContentType(requests.exceptions.RequestException):
+    """The response has a Content-Type the caller did not ask for."""
+
+
+def content_type(response):
+    return response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+
+def max_bytes_for(content_type):
+    """Byte cap for a content type, from the max_bytes setting."""
+    caps = _settings["max_bytes"]
+    return caps.get(content_type, caps.get("*"))
+
+
+def iter_body(response, max_bytes=None):
+    """Yield the body of a streamed response in chunks, closing the connection
+    and raising BodyTooLarge as soon as it is known to pass max_bytes
+    (by default the cap for its Content-Type)."""
+    if max_bytes is None:
+        max_bytes = max_bytes_for(content_type(response))
+    declared = response.headers.get("Content-Length", "")
+    if max_bytes is not None and declared.isdigit() and int(declared) > max_bytes:
+        _abort(response, BodyTooLarge(f"{response.url} is {int(declared)} bytes, over the cap of {max_bytes}"))
+    received = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        received += len(chunk)
+        if max_bytes is not None and received > max_bytes:
+            _abort(response, BodyTooLarge(f"{response.url} sent more than the cap of {max_bytes} bytes"))
+        yield chunk
+    # Fully read: the connection is back in the pool, so release the rate limiter slot too
+    response.close()
+
+
+def read_body(response, max_bytes=None):
+    """The body of a streamed response as bytes, within max_bytes (see iter_body)."""
+    return b"".join(iter_body(response, max_bytes))
+
+
+def _abort(response, error):
+    metrics.count("downloads_aborted_total", reason=type(error).__name__)
+    response.close()
+    raise error
+
+
+class Download:
+    """A downloaded body, held in memory (data) or spooled to a temporary file (path).
+
+    source is whichever of the two is set. Use as a context manager, or call
+    close(), to delete the temporary file.
+    """
+
+    def __init__(self, url, headers, data, path, size, sha256):
+        self.url = url
+        self.headers = headers
+        self.data = data
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def source(self):
+        return self.data if self.path is None else self.path
+
+    def close(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def download(url, content_types=None, max_bytes=None, spool_threshold=None, **kwargs):
+    """GET url as a stream and return a Download.
+
+    HTTP errors raise requests exceptions. With content_types, any other
+    Content-Type raises UnexpectedContentType before the body is read.
+    Bodies past max_bytes (default: the cap for the Content-Type) raise
+    BodyTooLarge, and bodies past spool_threshold are written to a
+    temporary file as they arrive.
+    """
+    if spool_threshold is None:
+        spool_threshold = _settings["spool_threshold"]
+    response = get(url, stream=True, **kwargs)
+    with response:
+        response.raise_for_status()
+        if content_types is not None and content_type(response) not in content_types:
+            _abort(response, UnexpectedContentType(f"{url} is {content_type(response) or 'untyped'}"))
+
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        spool = path = None
+        try:
+            for chunk in iter_body(response, max_bytes):
+                digest.update(chunk)
+                size += len(chunk)
+                if spool is None and size > spool_threshold:
+                    fd, path = tempfile.mkstemp(suffix=".download")
+                    spool = os.fdopen(fd, "wb")
+                    spool.writelines(chunks)
+                    chunks = None
+                if spool is None:
+                    chunks.append(chunk)
+                else:
+                    spool.write(chunk)
+        except BaseException:
+            if spool is not None:
+                spool.close()
+                os.remove(path)
+            raise
+        if spool is not None:
+            spool.close()
+    data = b"".join(chunks) if spool is None else None
+    return Download(response.url, response.headers, data, path, size, digest.hexdigest())
+
+
+def _retry_policy(retries, backoff_factor):
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=False,  # 429/503 and Retry-After are handled by the rate limiter
+        raise_on_status=False,
+    )
+
+
+def _http_adapter(pool_size, retries, backoff_factor):
+    return HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=_retry_policy(retries, backoff_factor),
+    )
+
+
+def _http2_adapter(pool_size, timeout, retries, backoff_factor):
+    try:
+        import httpx
+        import h2  # noqa: F401  (httpx needs it for http2=True)
+    except ImportError:
+        logger.warning("HTTP/2 requested but httpx[http2] is not installed; using HTTP/1.1")
+        return None
+    return HTTP2Adapter(httpx, pool_size, timeout, retries, backoff_factor)
+
+
+class HTTP2Adapter(BaseAdapter):
+    """Transport adapter that sends requests over HTTP/2 with httpx.
+
+    Responses are converted to requests.Response objects so callers do not
+    need to know which protocol was used.
+    """
+
+    def __init__(self, httpx, pool_size, timeout, retries, backoff_factor):
+        super().__init__()
+        self._httpx = httpx
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = httpx.Client(
+            timeout=_httpx_timeout(httpx, timeout),
+            transport=httpx.HTTPTransport(http2=True, retries=retries, limits=limits),
+        )
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = _httpx_timeout(self._httpx, timeout)
+
+        for attempt in range(self.retries + 1):
+            try:
+                httpx_request = self.client.build_request(
+                    request.method, request.url, headers=dict(request.headers),
+                    content=request.body, **kwargs)
+                httpx_response = self.client.send(httpx_request, stream=True)
+            except self._httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise requests.exceptions.ConnectionError(e, request=request)
+            else:
+                if httpx_response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return self._build_response(request, httpx_response, stream)
+                httpx_response.close()
+            time.sleep(self.backoff_factor * (2 ** attempt))
+
+    def _build_response(self, request, httpx_response, stream):
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.reason = httpx_response.reason_phrase
+        response.headers = CaseInsensitiveDict(httpx_response.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = str(httpx_response.url)
+        response.request = request
+        response.connection = self
+        response.raw = _HttpxRaw(httpx_response)
+        if not stream:
+            response.content  # read the body now, as requests does
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+class _HttpxRaw(io.RawIOBase):
+    """File-like view of a streamed httpx response body."""
+
+    def __init__(self, httpx_response):
+        self._response = httpx_response
+        self._chunks = httpx_response.iter_bytes()
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def read(self, amt=None):
+        while amt is None or len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._response.close()
+        super().close()
+
+    def release_conn(self):
+        self.close()
+
+
+def _httpx_timeout(httpx, timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
@@ -1,57 +1,320 @@
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import html_parsing
+import http_client
+import url_utils
+import discovery
+import metrics
+from crawl_traps import TrapDetector, TrapLimits
+from frontier import PageState, open_frontier
+from sitemap_writer import SitemapWriter
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import hashlib
+import argparse
 import os
 
-def crawl_website(base_url, max_depth=2):
-    visited = set()
-    sitemap = set()
 
-    def crawl(url, depth):
-        if depth > max_depth or url in visited:
-            return
-        visited.add(url)
+# Outcome of fetching one page. links is None when the page is unchanged
+# since the last crawl, in which case its stored links are reused.
+FetchResult = namedtuple("FetchResult", "links etag last_modified content_hash")
 
+
+def fetch_page(url, check_head=False, previous=None):
+    """Fetch an HTML page and return a FetchResult, or None if it has no links.
+
+    Non-HTML responses are abandoned after the headers; binary URLs are
+    still recorded in the sitemap by whoever linked to them. When previous
+    holds the page's state from the last crawl, a conditional GET is sent,
+    and a 304 or an identical body skips parsing.
+    """
+    headers = {}
+    if previous is not None:
+        if previous.etag:
+            headers["If-None-Match"] = previous.etag
+        if previous.last_modified:
+            headers["If-Modified-Since"] = previous.last_modified
+
+    try:
+        with metrics.timer("stage_seconds", stage="fetch"):
+            response = http_client.fetch_html(url, check_head=check_head, headers=headers)
+            if response is None:
+                metrics.count("pages_total", result="not_html")
+                return None
+            with response:
+                if response.status_code == 304 and previous is not None:
+                    metrics.count("pages_total", result="not_modified")
+                    return FetchResult(None, response.headers.get("ETag", previous.etag),
+                                       response.headers.get("Last-Modified", previous.last_modified),
+                                       previous.content_hash)
+                if response.status_code != 200:
+                    metrics.count("pages_total", result="http_error")
+                    return None
+                body = http_client.read_body(response)
+    except requests.exceptions.RequestException as e:
+        metrics.count("pages_total", result="error")
+        print(f"Error fetching {url}: {e}")
+        return None
+    metrics.count("bytes_total", len(body), stage="fetch")
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    content_hash = hashlib.sha1(body).hexdigest()
+    if previous is not None and previous.content_hash == content_hash:
+        metrics.count("pages_total", result="unchanged")
+        return FetchResult(None, etag, last_modified, content_hash)
+
+    metrics.count("pages_total", result="parsed")
+    with metrics.timer("stage_seconds", stage="parse"):
+        # Relative links resolve against the final URL, after any redirects
+        links = [urljoin(response.url, href) for href in html_parsing.extract_links(body)]
+    return FetchResult(links, etag, last_modified, content_hash)
+
+
+def w3c_lastmod(result, previous):
+    """The page's sitemap lastmod: its Last-Modified header if it sent one,
+    otherwise the last crawl at which its content changed."""
+    if result.last_modified:
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code != 200:
-                return
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching {url}: {e}")
-            return
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            full_url = urljoin(url, href)
-            parsed = urlparse(full_url)
-
-            if parsed.netloc == urlparse(base_url).netloc:
-                sitemap.add(full_url)
-                crawl(full_url, depth + 1)
-
-    crawl(base_url, 0)
-    return sitemap
-
-
-def save_sitemap_to_file(sitemap, file_name='sitemap.xml'):
-    with open(file_name, 'w') as file:
-        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        file.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            return parsedate_to_datetime(result.last_modified).astimezone(timezone.utc).isoformat()
+        except (TypeError, ValueError):
+            pass
+    if previous is not None and previous.content_hash == result.content_hash and previous.lastmod:
+        return previous.lastmod
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+
+
+def crawl_website(base_url, max_depth=2, max_workers=8, check_head=False,
+                  ignore_case=False, seen_set="exact", state_file=None, resume=False, sink=None,
+                  use_sitemaps=True, respect_robots=True, executor=None, share=None,
+                  detect_traps=True, trap_limits=TrapLimits()):
+    """Breadth-first crawl of base_url's host.
+
+    Pages up to max_depth links away from base_url are fetched, and every
+    same-host link found on them is recorded. The frontier is drained one
+    depth at a time so each URL is fetched at its shortest depth. Links that
+    point at binary files are recorded but never downloaded; with check_head
+    a HEAD request screens out non-HTML pages whose URL looks like a page.
+    max_workers caps the requests in flight; within it, http_client's rate
+    limiter sets how many go to the host at once and how fast.
+
+    Links are canonicalized before they are recorded or enqueued, so each
+    page is fetched once however it is spelled. Without state_file, seen_set
+    picks how visited URLs are remembered ('exact', 'fingerprint' or
+    'bloom').
+
+    With state_file, the frontier, visited set and sitemap are kept in an
+    SQLite database instead of memory; resume=True continues the crawl
+    stored there without fetching completed pages again. The state file
+    also keeps each page's ETag, Last-Modified and content hash, so later
+    crawls use conditional GETs and reuse the stored links of unchanged
+    pages instead of parsing them again.
+
+    With use_sitemaps, the sitemaps the site publishes (listed in robots.txt,
+    or /sitemap.xml) are read first and every page they list is recorded
+    with its lastmod and queued next to the root, so the pages they list
+    are fetched and their links followed even when nothing links to them.
+    On a recrawl with state_file, unchanged seeds cost a conditional GET
+    and are not parsed again. With
+    respect_robots, URLs disallowed by robots.txt are neither fetched nor
+    recorded.
+
+    With detect_traps, each new link is classified into a path template
+    (see crawl_traps.py) and skipped, neither fetched nor recorded, once its
+    template or one of its parameters has used up its budget in trap_limits,
+    or when its path repeats segments or is too deep. Each skipped URL is
+    counted once by reason, and the skips are summarized at the end of the
+    crawl.
+
+    To crawl several sites at once, pass a shared executor for the fetches
+    and share, a callable returning how many requests this crawl may
+    currently have in flight; max_workers is then not used.
+
+    Returns the set of sitemap URLs. If a sink such as a SitemapWriter is
+    given, each URL is instead passed to sink.add(url, lastmod) as soon as
+    it is final (after its page is fetched, when it is fetched at all), and
+    nothing is collected in memory; the function then returns None.
+    """
+    base_url = url_utils.canonicalize_url(base_url)
+    frontier = open_frontier(state_file, base_url, resume=resume, seen_set=seen_set,
+                             keep_sitemap=sink is None)
+    frontier.add(base_url, url_utils.url_key(base_url, ignore_case), 0)
+    traps = TrapDetector(trap_limits) if detect_traps else None
+    # Links skipped for robots.txt or as traps, so each is judged and counted once
+    rejected = url_utils.make_seen_set("fingerprint")
+
+    try:
+        if sink is not None:
+            for url, lastmod in frontier.finished_entries():
+                sink.add(url, lastmod)
+
+        if use_sitemaps:
+            seeded = 0
+            for loc, lastmod in discovery.discover(base_url):
+                if not url_utils.same_site(loc, base_url):
+                    continue
+                full_url = url_utils.canonicalize_url(loc, base_url)
+                if respect_robots and not discovery.allowed(full_url):
+                    continue
+                key = url_utils.url_key(full_url, ignore_case)
+                if http_client.looks_like_html(full_url):
+                    frontier.add(full_url, key, 0)
+                if frontier.seed(full_url, key, lastmod):
+                    seeded += 1
+                    if sink is not None and not frontier.is_open(key):
+                        sink.add(full_url, lastmod)
+            print(f"Seeded {seeded} URLs of {base_url} from published sitemaps")
+
+        own_executor = ThreadPoolExecutor(max_workers=max_workers) if executor is None else None
+        with own_executor or nullcontext(executor) as executor:
+            for depth in range(max_depth + 1):
+                in_flight = {}
+                while True:
+                    limit = share() if share is not None else max_workers * 2
+                    for url in frontier.claim(depth, limit - len(in_flight)):
+                        previous = frontier.page_state(url)
+                        future = executor.submit(fetch_page, url, check_head, previous)
+                        in_flight[future] = (url, previous)
+                    if not in_flight:
+                        break
+
+                    metrics.gauge("crawl_in_flight", len(in_flight))
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, previous = in_flight.pop(future)
+                        result = future.result()
+                        links, lastmod = [], None
+                        if result is not None:
+                            links = result.links if result.links is not None else previous.links
+                            lastmod = w3c_lastmod(result, previous)
+                            frontier.save_page(url, PageState(
+                                result.etag, result.last_modified, result.content_hash, lastmod, links))
+
+                        for link in links:
+                            if not url_utils.same_site(link, base_url):
+                                continue
+                            full_url = url_utils.canonicalize_url(link, base_url)
+                            key = url_utils.url_key(full_url, ignore_case)
+                            if key in rejected:
+                                continue
+                            if respect_robots and not discovery.allowed(full_url):
+                                rejected.add(key)
+                                metrics.count("urls_skipped_total", reason="robots")
+                                continue
+                            if traps is not None and not frontier.is_recorded(key):
+                                reason = traps.check(full_url)
+                                if reason is not None:
+                                    rejected.add(key)
+                                    metrics.count("urls_skipped_total", reason=reason)
+                                    continue
+                            if depth < max_depth and http_client.looks_like_html(full_url):
+                                frontier.add(full_url, key, depth + 1)
+                            # URLs still waiting to be fetched are written once they complete.
+                            if frontier.record(full_url, key) and sink is not None and not frontier.is_open(key):
+                                state = frontier.page_state(full_url)
+                                sink.add(full_url, state.lastmod if state else None)
+
+                        frontier.complete(url)
+                        key = url_utils.url_key(url, ignore_case)
+                        if sink is not None and frontier.is_recorded(key):
+                            sink.add(url, frontier.published_lastmod(key) or lastmod)
+
+        if traps is not None and traps.skipped:
+            print(f"Crawl traps on {base_url}:")
+            for line in traps.report():
+                print(line)
+        if sink is None:
+            return set(frontier.sitemap())
+    finally:
+        frontier.close()
+
+
+def save_sitemap_to_file(sitemap, file_name='sitemap.xml', lastmods=None, gzip_output=False):
+    lastmods = lastmods or {}
+    with SitemapWriter(file_name, gzip_output=gzip_output) as writer:
         for url in sorted(sitemap):
-            file.write(f'  <url>\n    <loc>{url}</loc>\n  </url>\n')
-        file.write('</urlset>\n')
+            writer.add(url, lastmods.get(url))
+    return writer.files
 
 
 if __name__ == "__main__":
-    website_url = input("Enter the website URL: ").strip()
+    parser = argparse.ArgumentParser(description="Generate a sitemap.xml by crawling a website.")
+    parser.add_argument("url", nargs="?", help="website to crawl (prompted for if omitted)")
+    parser.add_argument("--max-depth", type=int, default=2, help="link depth to crawl (default: 2)")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent requests overall (default: 8)")
+    parser.add_argument("--per-host", type=int, default=8,
+                        help="most concurrent requests per host; the rate limiter ramps up to it (default: 8)")
+    parser.add_argument("--fixed-rate", action="store_true",
+                        help="always use --per-host requests per host instead of adapting to the server")
+    parser.add_argument("--ignore-crawl-delay", action="store_true", help="do not apply robots.txt Crawl-delay")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout in seconds (default: 10)")
+    parser.add_argument("--head", action="store_true", help="send a HEAD request to check the content type before each GET")
+    parser.add_argument("--ignore-case", action="store_true", help="treat URLs differing only in case as the same page")
+    parser.add_argument("--seen-set", choices=sorted(url_utils.SEEN_SET_KINDS), default="exact",
+                        help="how visited URLs are stored with --no-state; 'fingerprint' and 'bloom' use less memory")
+    parser.add_argument("--state", default="crawl_state.db",
+                        help="SQLite file that stores crawl progress (default: crawl_state.db)")
+    parser.add_argument("--no-state", action="store_true", help="keep crawl progress in memory only")
+    parser.add_argument("--resume", action="store_true", help="continue the crawl stored in --state")
+    parser.add_argument("--gzip", action="store_true", help="write gzip-compressed sitemap files")
+    parser.add_argument("--sitemap-base-url",
+                        help="URL the sitemap files will be served from, used in the sitemap index "
+                             "(default: the root of the crawled site)")
+    parser.add_argument("--no-sitemaps", action="store_true",
+                        help="do not seed the crawl from the sitemaps the site already publishes")
+    parser.add_argument("--ignore-robots", action="store_true", help="crawl paths that robots.txt disallows")
+    parser.add_argument("--no-trap-detection", action="store_true",
+                        help="follow every link, even in calendars, searches and other endless URL spaces")
+    parser.add_argument("--template-budget", type=int, default=TrapLimits().template_budget,
+                        help="URLs crawled per path template, with numbers and IDs collapsed (default: %(default)s)")
+    parser.add_argument("--parameter-budget", type=int, default=TrapLimits().parameter_budget,
+                        help="URLs crawled per query parameter of a path, over all templates using it "
+                             "(default: %(default)s)")
+    parser.add_argument("--path-parameter-budget", type=int, default=TrapLimits().path_parameter_budget,
+                        help="URLs crawled per +action or name=value path segment (default: %(default)s)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write metrics when done: JSON for *.json, Prometheus text otherwise")
+    parser.add_argument("--metrics-interval", type=float, default=30,
+                        help="seconds between metric summaries while crawling; 0 for none (default: 30)")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and save the stats to FILE")
+    parser.add_argument("--http2", action="store_true", help="use HTTP/2 when httpx[http2] is installed")
+    parser.add_argument("--max-page-mb", type=float, default=10,
+                        help="skip pages larger than this many megabytes (default: 10)")
+    args = parser.parse_args()
+    if args.seen_set != "exact" and not args.no_state:
+        parser.error("--seen-set only applies with --no-state; the --state file keeps visited URLs on disk")
+    page_cap = int(args.max_page_mb * 1024 ** 2)
+    http_client.configure(pool_size=args.workers, timeout=args.timeout, http2=args.http2,
+                          max_per_host=args.per_host, adaptive=not args.fixed_rate,
+                          crawl_delay=not args.ignore_crawl_delay,
+                          max_bytes={content_type: page_cap for content_type in http_client.HTML_CONTENT_TYPES})
+
+    website_url = args.url or input("Enter the website URL: ").strip()
     sitemap_file_name = "sitemap.xml"
 
     print("Crawling the website...")
-    sitemap = crawl_website(website_url)
-
-    print(f"Found {len(sitemap)} URLs. Saving to {sitemap_file_name}...")
-    save_sitemap_to_file(sitemap, sitemap_file_name)
-
-    print(f"Sitemap saved as {sitemap_file_name} in the current directory.")
+    with metrics.profiled(args.profile), metrics.Reporter(args.metrics_interval), \
+            SitemapWriter(sitemap_file_name, gzip_output=args.gzip,
+                          sitemap_base_url=args.sitemap_base_url or urljoin(website_url, "/")) as writer:
+        metrics.gauge("sitemap_urls", lambda: writer.url_count)
+        crawl_website(website_url, max_depth=args.max_depth,
+                      max_workers=args.workers,
+                      check_head=args.head, ignore_case=args.ignore_case,
+                      seen_set=args.seen_set,
+                      state_file=None if args.no_state else args.state,
+                      resume=args.resume, sink=writer,
+                      use_sitemaps=not args.no_sitemaps, respect_robots=not args.ignore_robots,
+                      detect_traps=not args.no_trap_detection,
+                      trap_limits=TrapLimits(args.template_budget, args.parameter_budget,
+                                             path_parameter_budget=args.path_parameter_budget))
 
+    print(f"Found {writer.url_count} URLs. Saved to {', '.join(writer.files)} in the current directory.")
+    for host, rate in http_client.rates().items():
+        print(f"{host}: {rate['requests']} requests, {rate['throttled']} throttled, "
+              f"ended at {rate['concurrency']} concurrent, latency {rate['latency_ms']} ms")
+    if args.metrics:
+        metrics.dump(args.metrics)
+        print(f"Metrics saved to {args.metrics}")
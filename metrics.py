@@ -0,0 +1,300 @@
+"""Lightweight pipeline metrics: counters, latency histograms and gauges.
+
+All metrics live in one process-wide registry and are safe to update from
+any thread. Names follow Prometheus conventions and take optional labels:
+
+    metrics.count("pages_fetched_total")
+    metrics.count("bytes_total", len(body), stage="fetch")
+    with metrics.timer("stage_seconds", stage="parse"):
+        ...
+    metrics.gauge("pdf_queue_depth", pdf_queue.qsize)
+
+A timer that exits with an exception also counts an error for its labels
+in errors_total. The registry can be rendered as a one-line summary
+(Reporter logs one periodically), as Prometheus text or as JSON, and
+profiled() wraps a run in cProfile.
+"""
+import bisect
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate of the q-th quantile, interpolated linearly within its bucket
+        (max for the +Inf bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return min(lower + (bound - lower) * (rank - seen) / count, self.max)
+            seen += count
+            lower = bound
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.started = time.monotonic()
+
+    def count(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name, value, **labels):
+        """Set a gauge to a number, or to a callable read at report time."""
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count("errors_total", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.gauges.clear()
+            self.started = time.monotonic()
+
+    def snapshot(self):
+        """All current values as plain data."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: histogram.to_dict() for key, histogram in self.histograms.items()}
+            gauges = dict(self.gauges)
+        gauges = {key: _read_gauge(value) for key, value in gauges.items()}
+        return {"uptime_s": round(time.monotonic() - self.started, 3),
+                "counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def to_json(self):
+        snapshot = self.snapshot()
+        return {
+            "uptime_s": snapshot["uptime_s"],
+            "counters": [_labelled(key, value=value) for key, value in snapshot["counters"].items()],
+            "histograms": [_labelled(key, **value) for key, value in snapshot["histograms"].items()],
+            "gauges": [_labelled(key, value=value) for key, value in snapshot["gauges"].items()],
+        }
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.counts), h.count, h.sum, h.buckets))
+                                for key, h in self.histograms.items())
+            gauges = sorted(self.gauges.items(), key=lambda item: item[0])
+        for (name, labels), value in counters:
+            lines.append(f"{name}{_prometheus_labels(labels)} {value}")
+        for (name, labels), (counts, count, total, buckets) in histograms:
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_prometheus_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_count{_prometheus_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_prometheus_labels(labels)} {total:.6f}")
+        for (name, labels), value in gauges:
+            value = _read_gauge(value)
+            if value is not None:
+                lines.append(f"{name}{_prometheus_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One line with throughput, latency percentiles and error counts."""
+        snapshot = self.snapshot()
+        uptime = max(snapshot["uptime_s"], 1e-9)
+        parts = [f"{snapshot['uptime_s']:.0f}s"]
+        for (name, labels), value in sorted(snapshot["counters"].items()):
+            label = _short_name(name, labels)
+            if name.startswith("bytes"):
+                parts.append(f"{label}={value / 1e6:.2f}MB ({value / 1e6 / uptime:.2f}MB/s)")
+            else:
+                parts.append(f"{label}={value}")
+        for (name, labels), value in sorted(snapshot["histograms"].items()):
+            label = _short_name(name, labels)
+            parts.append(f"{label} n={value['count']} p50={_ms(value['p50'])} p99={_ms(value['p99'])} "
+                         f"({value['count'] / uptime:.1f}/s)")
+        for (name, labels), value in sorted(snapshot["gauges"].items()):
+            parts.append(f"{_short_name(name, labels)}={value}")
+        return " | ".join(parts)
+
+    def dump(self, path):
+        """Write the metrics to path: JSON for *.json, Prometheus text otherwise."""
+        with open(path, "w", encoding="utf-8") as file:
+            if path.endswith(".json"):
+                json.dump(self.to_json(), file, indent=2)
+            else:
+                file.write(self.prometheus_text())
+
+
+REGISTRY = Registry()
+count = REGISTRY.count
+observe = REGISTRY.observe
+gauge = REGISTRY.gauge
+timer = REGISTRY.timer
+summary = REGISTRY.summary
+dump = REGISTRY.dump
+
+
+class Reporter:
+    """Calls emit(summary line) every interval seconds, and once more on stop."""
+
+    def __init__(self, interval=30.0, emit=print, registry=REGISTRY):
+        self.interval = interval
+        self.emit = emit
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+
+    def start(self):
+        if self.interval > 0:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.emit("metrics: " + self.registry.summary())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.emit("metrics: " + self.registry.summary())
+
+
+@contextmanager
+def profiled(path=None, top=25, emit=print):
+    """Run the block under cProfile when path is given, saving the stats there
+    and emitting the top functions by cumulative time.
+
+    Threads started inside the block (crawl and PDF workers, the output
+    writer) are profiled too and their stats merged with the calling
+    thread's; threads that were already running are not.
+    """
+    if not path:
+        yield
+        return
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def profile_thread(frame, event, arg):
+        # Runs once, as the first profile event of each new thread, and
+        # replaces itself with a profiler of that thread.
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    # From Python 3.12 cProfile uses sys.monitoring, which already sees every thread.
+    per_thread = sys.version_info < (3, 12)
+    if per_thread:
+        threading.setprofile(profile_thread)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        if per_thread:
+            threading.setprofile(None)
+        with lock:
+            stats = pstats.Stats(*profilers)
+        stats.dump_stats(path)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+        emit(f"Profile saved to {path} ({len(profilers)} threads); top {top} by cumulative time:")
+        for (file_name, line, function), (_, calls, _, cumulative, _) in rows:
+            emit(f"  {cumulative:8.3f}s {calls:>9} calls  {function} ({file_name}:{line})")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _labelled(key, **values):
+    name, labels = key
+    return {"name": name, "labels": dict(labels), **values}
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _short_name(name, labels):
+    return name + "".join(f"[{value}]" for _, value in labels)
+
+
+def _read_gauge(value):
+    if callable(value):
+        try:
+            return value()
+        except Exception:
+            return None
+    return value
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}ms"
@@ -0,0 +1,199 @@
+"""Buffered, thread-safe output for the scrapers.
+
+Worker threads hand complete records to an OutputSink, which queues them
+for a single writer thread. The writer keeps its files open with a large
+buffer, writes each record in one piece so records never interleave, and
+fsyncs every fsync_interval seconds and on close. With shards > 1 records
+are spread over name-0.txt, name-1.txt, ... by a hash of their key, so all
+records with the same key land in the same file.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from tabulate import tabulate
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_FSYNC_INTERVAL = 5.0
+DEFAULT_QUEUE_SIZE = 1000
+
+# A record part whose text is copied from a file, such as a cached PDF Markdown file.
+FilePart = namedtuple("FilePart", "path")
+
+_CLOSE = object()
+
+
+def shard_file_names(file_name, shards):
+    """Names of the files an OutputSink with this many shards writes."""
+    if shards == 1:
+        return [file_name]
+    stem, ext = os.path.splitext(file_name)
+    if ext == ".gz":
+        stem, inner_ext = os.path.splitext(stem)
+        ext = inner_ext + ext
+    return [f"{stem}-{index}{ext}" for index in range(shards)]
+
+
+def open_parts(parts):
+    """Open the FileParts among parts, leaving other values as they are."""
+    opened = []
+    try:
+        for part in parts:
+            opened.append(open(part.path, "r", encoding="utf-8") if isinstance(part, FilePart) else part)
+    except OSError:
+        close_parts(opened)
+        raise
+    return opened
+
+
+def close_parts(parts):
+    for part in parts:
+        if hasattr(part, "read"):
+            part.close()
+
+
+def read_chunks(file, size):
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class OutputSink:
+    """Append records to one or more text files from a single writer thread.
+
+    write_page, write_duplicate and write_pdf format the scrapers' records
+    as Markdown-style text; RecordSink writes the same records as JSON.
+    """
+
+    def __init__(self, file_name="final_output.txt", shards=1, buffer_size=DEFAULT_BUFFER_SIZE,
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL, queue_size=DEFAULT_QUEUE_SIZE):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.file_names = shard_file_names(file_name, shards)
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval
+        self.records = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._closed = False
+        self._files = [self._open_file(name) for name in self.file_names]
+        self._thread = threading.Thread(target=self._run, name="output-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, key, *parts):
+        """Queue one record made of parts (strings or FileParts), written contiguously.
+
+        key picks the shard. Files named by FileParts are opened here, so
+        they can be replaced or deleted once write returns. Blocks while
+        the writer is queue_size records behind.
+        """
+        self._put(key, open_parts(parts))
+
+    def write_page(self, url, content):
+        """Queue a scraped page (a page_extract.PageContent): its text, then its tables."""
+        parts = []
+        if content.text:
+            parts.append(f"# Content from {url}\n\n{content.text}\n\n")
+        for i, rows in enumerate(content.tables, start=1):
+            table = tabulate(rows, headers="firstrow", tablefmt="github")
+            parts.append(f"# Table {i} from {url}\n\n{table}\n\n")
+        if parts:
+            self.write(url, *parts)
+
+    def write_duplicate(self, url, duplicate_of, fetch=None):
+        """Queue a page whose content is a near-duplicate of the page at duplicate_of."""
+        self.write(url, f"# Content from {url}\n\nNear-duplicate of {duplicate_of}\n\n")
+
+    def write_pdf(self, pdf_url, markdown, source=None):
+        """Queue a PDF's Markdown, a string or a FilePart; source is the page linking to it."""
+        self.write(pdf_url, f"# Content from PDF: {pdf_url}\n\n", markdown, "\n\n")
+
+    def pending(self):
+        """Records queued but not yet written."""
+        return self._queue.qsize()
+
+    def _put(self, key, item):
+        if self._closed:
+            close_parts(item)
+            raise ValueError("write to a closed OutputSink")
+        self._raise_error()
+        shard = zlib.crc32(key.encode("utf-8")) % len(self._files)
+        self._queue.put((shard, item))
+
+    def close(self):
+        """Write everything still queued, fsync and close the files."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        for file in self._files:
+            file.close()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Output writer failed: {self._error}") from self._error
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                item = None
+            if item is _CLOSE:
+                self._sync()
+                return
+            if item is not None:
+                with metrics.timer("stage_seconds", stage="write"):
+                    self._write_record(*item)
+            if time.monotonic() - last_sync >= self.fsync_interval:
+                self._sync()
+                last_sync = time.monotonic()
+
+    def _open_file(self, name):
+        return open(name, "a", encoding="utf-8", buffering=self.buffer_size)
+
+    def _write_record(self, shard, parts):
+        try:
+            self._write(self._files[shard], shard, parts)
+            self.records += 1
+        except Exception as e:
+            logger.error(f"Error writing to {self.file_names[shard]}: {e}")
+            self._error = self._error or e
+        finally:
+            close_parts(parts)
+
+    def _write(self, file, shard, parts):
+        for part in parts:
+            if isinstance(part, str):
+                file.write(part)
+            else:
+                for chunk in read_chunks(part, self.buffer_size):
+                    file.write(chunk)
+
+    def _sync(self):
+        for name, file in zip(self.file_names, self._files):
+            try:
+                file.flush()
+                os.fsync(file.fileno())
+            except OSError as e:
+                logger.error(f"Error syncing {name}: {e}")
+                self._error = self._error or e
@@ -0,0 +1,71 @@
+"""Single-pass page extraction shared by the scrapers.
+
+Each page is downloaded once and parsed once; the text, tables and PDF
+links all come out of the same tree.
+"""
+from collections import namedtuple
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+
+import html_parsing
+import http_client
+import metrics
+
+# The only tags the extraction below reads.
+CONTENT_TAGS = ["p", "table", "a"]
+
+# text: the <p> text joined by newlines; tables: one list of cell-text rows
+# per <table>; pdf_links: absolute URLs of linked PDFs; fetch: a dict
+# describing the response (set by fetch_page_content only).
+PageContent = namedtuple("PageContent", "text tables pdf_links fetch", defaults=(None,))
+
+
+def extract_page_content(html, url):
+    """Extract text, tables and PDF links from an HTML document."""
+    soup = html_parsing.make_soup(html, CONTENT_TAGS)
+
+    text_content = "\n".join(p.get_text() for p in soup.find_all("p"))
+
+    tables = []
+    for table in soup.find_all("table"):
+        rows = [[cell.get_text(strip=True) for cell in tr.find_all(["th", "td"])]
+                for tr in table.find_all("tr")]
+        if rows:
+            tables.append(rows)
+
+    pdf_links = []
+    for link in soup.find_all("a", href=True):
+        href = link["href"]
+        if href.endswith(".pdf"):
+            pdf_links.append(urljoin(url, href))
+
+    return PageContent(text_content, tables, pdf_links)
+
+
+def fetch_page_content(url):
+    """Download url once and extract its content, or return None if it is not HTML.
+
+    HTTP errors are raised as requests exceptions.
+    """
+    with metrics.timer("stage_seconds", stage="fetch"):
+        response = http_client.fetch_html(url)
+        if response is None:
+            return None
+        with response:
+            response.raise_for_status()
+            html = http_client.read_body(response)
+    metrics.count("bytes_total", len(html), stage="fetch")
+    fetch = {
+        "url": response.url,
+        "status": response.status_code,
+        "content_type": response.headers.get("Content-Type"),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "bytes": len(html),
+        "elapsed_ms": round(response.elapsed.total_seconds() * 1000),
+        "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    with metrics.timer("stage_seconds", stage="parse"):
+        # Relative links resolve against the final URL, after any redirects
+        content = extract_page_content(html, response.url)
+    return content._replace(fetch=fetch)
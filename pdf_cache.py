@@ -0,0 +1,153 @@
+"""On-disk cache of Markdown extracted from PDFs.
+
+Entries are keyed by the canonical PDF URL plus a validator: the ETag or
+Last-Modified header from a HEAD request when the server sends one,
+otherwise a hash of the downloaded bytes. The cache survives between runs
+and is trimmed least-recently-used first once it grows past max_bytes.
+Concurrent requests for the same PDF share one download and extraction.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future
+
+import http_client
+import url_utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "pdf_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+class PdfMarkdownCache:
+    """Cache of Markdown files, one per PDF version."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._resolved = {}  # canonical URL -> Markdown path (or None) found earlier in this run
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(directory)
+                         if entry.name.endswith(".md"))
+
+    def get(self, pdf_url, download, convert):
+        """Path of the file holding the Markdown for pdf_url.
+
+        On a miss the PDF is downloaded with download(pdf_url), which returns
+        an http_client.Download, and converted with convert(pdf_source, path),
+        which writes the Markdown to path; pdf_source is the PDF's bytes, or
+        the path of its temporary file for large PDFs.
+        Returns None if the conversion produced nothing; empty results are
+        not cached. If another thread is already producing the same PDF,
+        wait for its result instead. A PDF resolved earlier in this run is
+        not checked with the server again.
+        """
+        url = url_utils.canonicalize_url(pdf_url)
+        with self._lock:
+            resolved = self._resolved.get(url, False)
+        if resolved is None or (resolved and self._hit(resolved)):
+            return resolved
+        with self._lock:
+            pending = self._in_flight.get(url)
+            if pending is None:
+                self._in_flight[url] = future = Future()
+        if pending is not None:
+            return pending.result()
+
+        try:
+            markdown_path = self._get_uncached(url, pdf_url, download, convert)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(markdown_path)
+            with self._lock:
+                self._resolved[url] = markdown_path
+            return markdown_path
+        finally:
+            with self._lock:
+                del self._in_flight[url]
+
+    def _get_uncached(self, url, pdf_url, download, convert):
+        validator = self._header_validator(pdf_url)
+        if validator:
+            path = self._path(url, validator)
+            if self._hit(path):
+                return path
+
+        with download(pdf_url) as pdf:
+            if not validator:
+                path = self._path(url, "sha256:" + pdf.sha256)
+                if self._hit(path):
+                    return path
+
+            with self._lock:
+                self.misses += 1
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                convert(pdf.source, temp_path)
+                if os.path.getsize(temp_path) == 0:
+                    return None
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        self._added(path)
+        return path
+
+    def _header_validator(self, pdf_url):
+        try:
+            response = http_client.head(pdf_url)
+        except Exception as e:
+            logger.debug(f"HEAD failed for {pdf_url}: {e}")
+            return None
+        if not response.ok:
+            return None
+        if response.headers.get("ETag"):
+            return "etag:" + response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            return f"modified:{response.headers['Last-Modified']}:{response.headers.get('Content-Length', '')}"
+        return None
+
+    def _path(self, url, validator):
+        digest = hashlib.sha256(f"{url}\n{validator}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".md")
+
+    def _hit(self, path):
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def _added(self, path):
+        with self._lock:
+            self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+
+    def _evict(self, keep):
+        """Delete least recently used entries, except keep, until the cache fits in max_bytes."""
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".md")),
+                         key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            if entry.path == keep:
+                continue
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+            logger.debug(f"Evicted {entry.name} from the PDF cache")
@@ -0,0 +1,74 @@
+"""PDF to Markdown conversion.
+
+PDFs are opened straight from memory, or from disk when given as a file
+path (http_client.download spools downloads larger than its
+spool_threshold to a temporary file, so large documents always arrive
+as a path). Each document is opened once by pdfplumber (tables) and once
+by PyMuPDF (text), and both are read in the same pass over the pages.
+The Markdown is produced one page at a time, with each table placed
+under the page it was found on. Tables are best effort: when pdfplumber
+cannot open the document or a page, the PyMuPDF text is still written.
+"""
+import io
+import logging
+import os
+from contextlib import ExitStack, contextmanager
+
+import fitz  # PyMuPDF
+import pdfplumber
+from tabulate import tabulate
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def open_pdf(pdf_data):
+    """Yield (pdfplumber document or None, PyMuPDF document) for the PDF bytes or file path.
+
+    The pdfplumber document is None when pdfplumber cannot open the PDF.
+    """
+    is_path = isinstance(pdf_data, (str, os.PathLike))
+    with ExitStack() as stack:
+        fitz_doc = stack.enter_context(fitz.open(pdf_data) if is_path else fitz.open(stream=pdf_data, filetype="pdf"))
+        try:
+            plumber_pdf = stack.enter_context(pdfplumber.open(pdf_data if is_path else io.BytesIO(pdf_data)))
+        except Exception as e:
+            logger.debug(f"pdfplumber could not open the PDF, extracting text only: {e}")
+            plumber_pdf = None
+        yield plumber_pdf, fitz_doc
+
+
+def page_tables(plumber_pdf, page_num):
+    """Tables on one page as lists of rows, or [] if pdfplumber fails on it."""
+    if plumber_pdf is None:
+        return []
+    try:
+        plumber_page = plumber_pdf.pages[page_num]
+        try:
+            return [table for table in plumber_page.extract_tables() if table]
+        finally:
+            plumber_page.close()  # drop the page's cached layout objects
+    except Exception as e:
+        logger.debug(f"No tables from page {page_num + 1}: {e}")
+        return []
+
+
+def iter_pdf_markdown(pdf_data):
+    """Yield the Markdown of a PDF, given as bytes or a file path, one page at a time."""
+    table_number = 0
+    with open_pdf(pdf_data) as (plumber_pdf, fitz_doc):
+        for page_num in range(fitz_doc.page_count):
+            parts = [f"## Page {page_num + 1}\n\n"]
+            for table in page_tables(plumber_pdf, page_num):
+                table_number += 1
+                markdown_table = tabulate(table, headers="firstrow", tablefmt="github")
+                parts.append(f"### Table {table_number}\n{markdown_table}\n\n")
+            parts.append(fitz_doc.load_page(page_num).get_text("text") + "\n\n")
+            yield "".join(parts)
+
+
+def write_pdf_markdown(pdf_data, path):
+    """Write the Markdown of a PDF to path page by page, without holding it all in memory."""
+    with open(path, "w", encoding="utf-8") as file:
+        for page_markdown in iter_pdf_markdown(pdf_data):
+            file.write(page_markdown)
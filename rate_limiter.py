@@ -0,0 +1,199 @@
+"""Adaptive per-host concurrency and request-rate control.
+
+Every request to a host takes a slot from that host's controller. Each
+controller keeps a concurrency limit and a minimum interval between
+request starts, adjusted from the server's responses (AIMD, as in TCP):
+
+- while the latency stays within latency_factor of the best latency seen,
+  the concurrency limit grows by about one per round trip and the interval
+  shrinks towards the host's floor;
+- on 429/503, a timeout or a dropped connection, the concurrency limit is
+  multiplied by decrease and the interval is doubled;
+- a Retry-After header pauses the host until the given time;
+- a robots.txt Crawl-delay becomes the host's floor interval.
+
+snapshot() reports the current limits for logging.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+THROTTLE_STATUSES = (429, 503)
+MIN_BACKOFF_INTERVAL = 0.25  # seconds between requests after the first backoff
+MAX_INTERVAL = 60.0
+MAX_RETRY_AFTER = 300.0
+LATENCY_SMOOTHING = 0.2
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class HostController:
+    """Concurrency limit and request spacing for one host."""
+
+    def __init__(self, initial_concurrency, max_concurrency, min_concurrency=1,
+                 latency_factor=2.0, decrease=0.5):
+        self.limit = float(initial_concurrency)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_factor = latency_factor
+        self.decrease = decrease
+        self.floor_interval = 0.0  # robots.txt Crawl-delay
+        self.crawl_delay_known = False
+        self.interval = 0.0
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.latency = None  # smoothed seconds to response headers
+        self.best_latency = None
+        self.requests = 0
+        self.throttled = 0
+
+    def can_start(self, now):
+        return self.in_flight < max(self.min_concurrency, int(self.limit)) and now >= self.next_start
+
+    def start(self, now):
+        self.in_flight += 1
+        self.requests += 1
+        self.next_start = max(now, self.next_start) + self.interval
+
+    def finish(self, latency=None, throttled=False, retry_after=None, now=None):
+        self.in_flight -= 1
+        if throttled:
+            self.throttled += 1
+            self.limit = max(self.min_concurrency, self.limit * self.decrease)
+            self.interval = min(MAX_INTERVAL, max(MIN_BACKOFF_INTERVAL, self.floor_interval, self.interval * 2))
+        elif latency is not None:
+            self.latency = latency if self.latency is None else (
+                LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.latency)
+            if self.best_latency is None or self.latency < self.best_latency:
+                self.best_latency = self.latency
+            if self.latency <= self.latency_factor * self.best_latency:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.interval = max(self.floor_interval, self.interval * 0.9)
+                if self.interval < 0.01:
+                    self.interval = self.floor_interval
+        if retry_after is not None:
+            now = time.monotonic() if now is None else now
+            self.next_start = max(self.next_start, now + min(retry_after, MAX_RETRY_AFTER))
+
+    def set_crawl_delay(self, seconds):
+        self.crawl_delay_known = True
+        self.floor_interval = seconds
+        self.interval = max(self.interval, seconds)
+
+    def snapshot(self):
+        return {
+            "concurrency": round(self.limit, 2),
+            "interval_s": round(self.interval, 3),
+            "max_rps": round(1 / self.interval, 2) if self.interval else None,
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "crawl_delay_s": self.floor_interval or None,
+            "requests": self.requests,
+            "throttled": self.throttled,
+        }
+
+
+class RateLimiter:
+    """Shared per-host controllers. Use slot(url) around each request.
+
+    With adaptive=False every host gets a fixed max_concurrency and only
+    Retry-After and Crawl-delay are applied.
+    """
+
+    def __init__(self, max_concurrency=8, initial_concurrency=2, adaptive=True,
+                 latency_factor=2.0, decrease=0.5):
+        self.max_concurrency = max_concurrency
+        self.initial_concurrency = min(initial_concurrency, max_concurrency) if adaptive else max_concurrency
+        self.adaptive = adaptive
+        self.latency_factor = latency_factor
+        self.decrease = decrease
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def host(self, url):
+        """The controller for url's host, created on first use."""
+        host = urlparse(url).netloc
+        with self._condition:
+            controller = self._hosts.get(host)
+            if controller is None:
+                controller = self._hosts[host] = HostController(
+                    self.initial_concurrency, self.max_concurrency,
+                    latency_factor=self.latency_factor, decrease=self.decrease)
+            return controller
+
+    def set_crawl_delay(self, url, seconds):
+        controller = self.host(url)
+        with self._condition:
+            controller.set_crawl_delay(seconds)
+
+    @contextmanager
+    def slot(self, url):
+        """Wait for a request slot on url's host and yield a Permit.
+
+        Call permit.observe(response) once the response headers are in.
+        Timeouts and connection errors raised inside the block count as
+        throttling; the exception is re-raised.
+        """
+        controller = self.host(url)
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if controller.can_start(now):
+                    controller.start(now)
+                    break
+                wait = controller.next_start - now if controller.next_start > now else None
+                self._condition.wait(wait)
+
+        permit = Permit()
+        try:
+            yield permit
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            permit.throttled = True
+            raise
+        finally:
+            with self._condition:
+                controller.finish(
+                    latency=permit.latency if self.adaptive else None,
+                    throttled=permit.throttled and self.adaptive,
+                    retry_after=permit.retry_after)
+                self._condition.notify_all()
+
+    def snapshot(self):
+        """Current limits per host, for logging and reports."""
+        with self._condition:
+            return {host: controller.snapshot() for host, controller in self._hosts.items()}
+
+
+class Permit:
+    """What a request learned about its host, reported back when its slot is released."""
+
+    def __init__(self):
+        self.latency = None
+        self.throttled = False
+        self.retry_after = None
+
+    def observe(self, response):
+        self.latency = response.elapsed.total_seconds()
+        if response.status_code in THROTTLE_STATUSES:
+            self.throttled = True
+            self.retry_after = parse_retry_after(response.headers.get("Retry-After"))
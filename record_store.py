@@ -0,0 +1,238 @@
+"""Structured scraper output: gzipped JSONL shards with a URL index.
+
+Each record is one JSON object on one line, compressed as its own gzip
+member and appended to a shard. Concatenated gzip members are still a
+valid gzip file, so a whole shard reads as JSONL with zcat or gzip.open.
+An SQLite index maps every URL to its shard, byte offset and length, so
+reading one record only seeks to and decompresses its own bytes.
+
+Lookup and partial export:
+    python record_store.py final_output.idx.db https://example.com/page
+    python record_store.py final_output.idx.db --prefix https://example.com/docs/ --output docs.jsonl
+    python record_store.py final_output.idx.db --list
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import sys
+import zlib
+from datetime import datetime, timezone
+
+from output_sink import OutputSink, close_parts, open_parts, read_chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECORD_FILE = "final_output.jsonl.gz"
+COMPRESS_LEVEL = 6
+
+
+def index_file_name(file_name):
+    """The index file that goes with the record shards named after file_name."""
+    stem = file_name
+    for ext in (".gz", ".jsonl"):
+        if stem.endswith(ext):
+            stem = stem[:-len(ext)]
+    return stem + ".idx.db"
+
+
+def _create_index(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("""CREATE TABLE IF NOT EXISTS records (
+        url TEXT PRIMARY KEY, type TEXT, shard TEXT, offset INTEGER, length INTEGER)""")
+    return db
+
+
+def page_record(url, content):
+    """Record for a scraped page, given its page_extract.PageContent."""
+    return {"url": url, "type": "page", "text": content.text, "tables": content.tables,
+            "pdf_links": content.pdf_links, "fetch": content.fetch}
+
+
+def duplicate_record(url, duplicate_of, fetch=None):
+    """Record for a page whose content is a near-duplicate of the page at duplicate_of."""
+    return {"url": url, "type": "duplicate", "duplicate_of": duplicate_of, "fetch": fetch}
+
+
+def pdf_record(pdf_url, markdown, source=None):
+    """Record for a PDF; markdown is a string or a FilePart."""
+    return {"url": pdf_url, "type": "pdf", "source": source, "markdown": markdown,
+            "converted_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+
+class RecordSink(OutputSink):
+    """OutputSink that writes dict records to gzipped JSONL shards and indexes them by URL.
+
+    Records must have a "url" key; a later record for the same URL replaces
+    the earlier one in the index. Values may be FileParts, whose file is
+    streamed into the JSON string without being read into memory at once.
+    """
+
+    def __init__(self, file_name=DEFAULT_RECORD_FILE, shards=1, index_file=None, **options):
+        self.index_file = index_file or index_file_name(file_name)
+        self._index = _create_index(self.index_file)
+        self._index_dir = os.path.dirname(os.path.abspath(self.index_file))
+        super().__init__(file_name, shards=shards, **options)
+
+    def write(self, record):
+        """Queue one record (a dict with at least "url") for writing."""
+        names = list(record)
+        values = open_parts(record.values())
+        try:
+            self._put(record["url"], (names, values))
+        except Exception:
+            close_parts(values)
+            raise
+
+    def write_page(self, url, content):
+        self.write(page_record(url, content))
+
+    def write_duplicate(self, url, duplicate_of, fetch=None):
+        self.write(duplicate_record(url, duplicate_of, fetch))
+
+    def write_pdf(self, pdf_url, markdown, source=None):
+        self.write(pdf_record(pdf_url, markdown, source))
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._index.commit()
+            self._index.close()
+
+    def _open_file(self, name):
+        return open(name, "ab", buffering=self.buffer_size)
+
+    def _write_record(self, shard, item):
+        names, values = item
+        file = self._files[shard]
+        try:
+            offset = file.tell()
+            compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # 31: gzip framing
+            for piece in self._json_pieces(names, values):
+                file.write(compressor.compress(piece.encode("utf-8")))
+            file.write(compressor.flush())
+            record = dict(zip(names, values))
+            shard_path = os.path.relpath(os.path.abspath(self.file_names[shard]), self._index_dir)
+            self._index.execute("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                                (record["url"], record.get("type"), shard_path, offset, file.tell() - offset))
+            self.records += 1
+        except Exception as e:
+            logger.error(f"Error writing to {self.file_names[shard]}: {e}")
+            self._error = self._error or e
+        finally:
+            close_parts(values)
+
+    def _json_pieces(self, names, values):
+        yield "{"
+        for i, (name, value) in enumerate(zip(names, values)):
+            yield ("" if i == 0 else ", ") + json.dumps(name) + ": "
+            if hasattr(value, "read"):
+                yield '"'
+                for chunk in read_chunks(value, self.buffer_size):
+                    yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+                yield '"'
+            else:
+                yield json.dumps(value, ensure_ascii=False)
+        yield "}\n"
+
+    def _sync(self):
+        try:
+            self._index.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error committing {self.index_file}: {e}")
+            self._error = self._error or e
+        super()._sync()
+
+
+class RecordIndex:
+    """Read access to the records listed in an index file."""
+
+    def __init__(self, index_file):
+        if not os.path.exists(index_file):
+            raise FileNotFoundError(index_file)
+        self.index_file = index_file
+        self._dir = os.path.dirname(os.path.abspath(index_file))
+        self._db = sqlite3.connect(index_file)
+        self._files = {}
+
+    def urls(self, prefix=None):
+        yield from (url for url, *_ in self._rows(prefix=prefix))
+
+    def get(self, url):
+        """The record for url, or None if it is not in the index."""
+        row = self._db.execute("SELECT url, shard, offset, length FROM records WHERE url = ?", (url,)).fetchone()
+        return json.loads(self._read(*row[1:])) if row else None
+
+    def iter_raw(self, urls=None, prefix=None):
+        """Yield the JSON line of each matching record, reading the shards in file order."""
+        for _, shard, offset, length in self._rows(urls, prefix):
+            yield self._read(shard, offset, length)
+
+    def close(self):
+        for file in self._files.values():
+            file.close()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _rows(self, urls=None, prefix=None):
+        query = "SELECT url, shard, offset, length FROM records"
+        if urls is not None:
+            rows = []
+            for url in urls:
+                row = self._db.execute(query + " WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    logger.warning(f"Not in the index: {url}")
+                else:
+                    rows.append(row)
+            return sorted(rows, key=lambda row: (row[1], row[2]))
+        if prefix is not None:
+            # Range scan on the primary key instead of LIKE, which would need escaping
+            return self._db.execute(query + " WHERE url >= ? AND url < ? ORDER BY shard, offset",
+                                    (prefix, prefix + "\U0010ffff"))
+        return self._db.execute(query + " ORDER BY shard, offset")
+
+    def _read(self, shard, offset, length):
+        file = self._files.get(shard)
+        if file is None:
+            file = self._files[shard] = open(os.path.join(self._dir, shard), "rb")
+        file.seek(offset)
+        return gzip.decompress(file.read(length)).decode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("index_file", help="index written next to the record shards (*.idx.db)")
+    parser.add_argument("urls", nargs="*", help="URLs to look up")
+    parser.add_argument("--prefix", help="export every record whose URL starts with this")
+    parser.add_argument("--list", action="store_true", help="only print the indexed URLs")
+    parser.add_argument("--output", help="write the records as JSONL here instead of stdout")
+    args = parser.parse_args()
+
+    with RecordIndex(args.index_file) as index:
+        if args.list:
+            for url in index.urls(args.prefix):
+                print(url)
+            return
+        urls = args.urls or None
+        if urls is None and args.prefix is None:
+            parser.error("give URLs, --prefix or --list")
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            for line in index.iter_raw(urls, args.prefix):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
+import argparse
 import xml.etree.ElementTree as ET
-import requests
-from bs4 import BeautifulSoup
+from page_extract import fetch_page_content
+from record_store import DEFAULT_RECORD_FILE, RecordSink
 
 def parse_sitemap(sitemap_file):
     """Parse the sitemap file to extract URLs."""
@@ -12,55 +13,22 @@ def parse_sitemap(sitemap_file):
     return urls
 
 def scrape_page(url):
-    """Scrape plain text and tables from the given URL."""
-    response = requests.get(url)
-    
-    # Check Content-Type to verify if the content is HTML
-    content_type = response.headers.get("Content-Type", "")
-    if "text/html" not in content_type:
+    """Scrape plain text, tables and PDF links from the given URL in one fetch."""
+    content = fetch_page_content(url)
+    if content is None:
         print(f"Non-HTML content detected: {url}")
         return "", [], []
 
-    soup = BeautifulSoup(response.content, "html.parser")
-
-    # Extract plain text content
-    text_content = "\n".join([p.get_text() for p in soup.find_all("p")])
-
-    # Extract tables and convert to Markdown
+    # Convert tables to Markdown
     tables = []
-    for table in soup.find_all("table"):
-        rows = []
-        for tr in table.find_all("tr"):
-            cells = [cell.get_text(strip=True) for cell in tr.find_all(["th", "td"])]
-            rows.append("| " + " | ".join(cells) + " |")
-        if rows:
-            header = rows[0]
-            separator = "| " + " | ".join(["---"] * len(header.split("|")[1:-1])) + " |"
-            rows.insert(1, separator)
-            tables.append("\n".join(rows))
-
-    return text_content, tables, None
-
-def extract_pdfs(url):
-    """Extract PDF links from the given URL."""
-    response = requests.get(url)
-    
-    # Check Content-Type to verify if the content is HTML
-    content_type = response.headers.get("Content-Type", "")
-    if "text/html" not in content_type:
-        print(f"Skipping non-HTML page: {url}")
-        return []
-
-    soup = BeautifulSoup(response.content, "html.parser")
-
-    pdf_links = []
-    for link in soup.find_all("a", href=True):
-        href = link["href"]
-        if href.endswith(".pdf"):
-            pdf_url = href if href.startswith("http") else url + href
-            pdf_links.append(pdf_url)
-
-    return pdf_links
+    for rows in content.tables:
+        rows = ["| " + " | ".join(cells) + " |" for cells in rows]
+        header = rows[0]
+        separator = "| " + " | ".join(["---"] * len(header.split("|")[1:-1])) + " |"
+        rows.insert(1, separator)
+        tables.append("\n".join(rows))
+
+    return content.text, tables, content.pdf_links
 
 def write_to_file(output_file, url, text_content, tables, pdf_links):
     """Write all content to a single text file in a structured format."""
@@ -81,19 +49,44 @@ def write_to_file(output_file, url, text_content, tables, pdf_links):
 
         file.write("\n" + "=" * 80 + "\n\n")  # Separator for clarity
 
+def write_records(urls, output_file):
+    """Write one structured record per page to gzipped JSONL with a URL index."""
+    with RecordSink(output_file) as sink:
+        for url in urls:
+            print(f"Scraping {url}...")
+            try:
+                content = fetch_page_content(url)
+                if content is None:
+                    print(f"Non-HTML content detected: {url}")
+                    continue
+                sink.write_page(url, content)
+            except Exception as e:
+                print(f"Error processing {url}: {e}")
+    print(f"All content saved to {output_file} (index: {sink.index_file})")
+
 def main():
     """Main script to parse sitemap, scrape content, and write to a file."""
-    sitemap_file = "sitemap_cleaned.xml"  # Path to your sitemap file
-    output_file = "website_content.txt"  # Output file
+    parser = argparse.ArgumentParser(description="Scrape the pages listed in a sitemap.")
+    parser.add_argument("sitemap_file", nargs="?", default="sitemap_cleaned.xml")  # Path to your sitemap file
+    parser.add_argument("--format", choices=("text", "jsonl"), default="text",
+                        help="jsonl: gzipped JSON records plus a URL index, see record_store.py")
+    parser.add_argument("--output", help=f"output file (default: website_content.txt, or {DEFAULT_RECORD_FILE} for jsonl)")
+    args = parser.parse_args()
+    sitemap_file = args.sitemap_file
 
     # Parse sitemap
     urls = parse_sitemap(sitemap_file)
 
+    if args.format == "jsonl":
+        write_records(urls, args.output or DEFAULT_RECORD_FILE)
+        return
+
+    output_file = args.output or "website_content.txt"  # Output file
+
     for url in urls:
         print(f"Scraping {url}...")
         try:
-            text_content, tables, _ = scrape_page(url)
-            pdf_links = extract_pdfs(url)
+            text_content, tables, pdf_links = scrape_page(url)
             write_to_file(output_file, url, text_content, tables, pdf_links)
         except Exception as e:
             print(f"Error processing {url}: {e}")
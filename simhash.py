@@ -0,0 +1,90 @@
+"""Near-duplicate detection of page text with SimHash.
+
+A page's fingerprint is the 64-bit SimHash of its word 3-shingles, so
+pages that differ in a few words (a login form, a search box, a changed
+date) get fingerprints a few bits apart. SimHashIndex finds an earlier
+fingerprint within max_distance bits without comparing against every
+page: fingerprints are split into max_distance + 1 bands, and two
+fingerprints that close must agree exactly on at least one band, so only
+pages sharing a band are compared.
+"""
+import hashlib
+import re
+import threading
+from collections import Counter, defaultdict
+
+BITS = 64
+SHINGLE_SIZE = 3
+MIN_WORDS = 30  # shorter texts are too small to fingerprint reliably
+DEFAULT_MAX_DISTANCE = 3
+
+WORD = re.compile(r"\w+")
+
+# Bit counts are summed in 32-bit lanes of one big integer, one lane per
+# fingerprint bit, instead of bit by bit in Python. _SPREAD maps a byte to
+# its 8 bits spread over 8 lanes.
+_LANE = 32
+_LANE_MASK = (1 << _LANE) - 1
+_SPREAD = [sum(1 << (bit * _LANE) for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def fingerprint(text, shingle_size=SHINGLE_SIZE, min_words=MIN_WORDS):
+    """SimHash of text, or None if it has fewer than min_words words."""
+    words = WORD.findall(text.lower())
+    if len(words) < min_words:
+        return None
+    shingles = Counter(" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1))
+    ones = 0  # lane i counts the shingles with bit i set
+    for shingle, count in shingles.items():
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=BITS // 8).digest()
+        ones += count * sum(_SPREAD[byte] << (i * 8 * _LANE) for i, byte in enumerate(digest))
+    total = sum(shingles.values())
+    return sum(1 << bit for bit in range(BITS) if 2 * (ones >> (bit * _LANE) & _LANE_MASK) > total)
+
+
+def distance(a, b):
+    """Number of bits in which two fingerprints differ."""
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """Fingerprints seen so far, searchable for near-duplicates. Thread-safe."""
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self._band_bits = -(-BITS // self.bands)
+        self._band_mask = (1 << self._band_bits) - 1
+        self._tables = [defaultdict(list) for _ in range(self.bands)]
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def _band_values(self, value):
+        return [(value >> (band * self._band_bits)) & self._band_mask for band in range(self.bands)]
+
+    def _find(self, value, bands):
+        for table, band_value in zip(self._tables, bands):
+            for other, key in table.get(band_value, ()):
+                if distance(value, other) <= self.max_distance:
+                    return key
+        return None
+
+    def find(self, value):
+        """Key of an indexed fingerprint within max_distance of value, or None."""
+        with self._lock:
+            return self._find(value, self._band_values(value))
+
+    def add(self, value, key):
+        """Index value under key unless a near-duplicate is already indexed.
+
+        Returns the key of that near-duplicate, or None if value was added.
+        """
+        bands = self._band_values(value)
+        with self._lock:
+            existing = self._find(value, bands)
+            if existing is not None:
+                return existing
+            for table, band_value in zip(self._tables, bands):
+                table[band_value].append((value, key))
+            self.size += 1
+            return None
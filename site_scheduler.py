@@ -0,0 +1,83 @@
+"""Crawl many sites at once within a global request budget.
+
+Each site is driven by its own crawl_website call running in a small
+coordinator thread, but all page fetches go through one shared executor
+of budget threads, so the total number of requests in flight never
+exceeds budget. The budget is split evenly between the sites still
+crawling (each gets at least one slot), so a big site cannot starve the
+others and the share of a finished site goes to the rest. Per-host limits
+come from http_client's rate limiter, which all the sites share.
+
+Each site's sitemap is streamed into its own file and closed as soon as
+that site finishes.
+"""
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from main import crawl_website
+from sitemap_writer import SitemapWriter
+
+logger = logging.getLogger(__name__)
+
+# One site to crawl: its URL, the sitemap file to write and its crawl state file (or None).
+Site = namedtuple("Site", "url sitemap_file state_file")
+
+# Outcome of one site's crawl. error is None on success.
+SiteResult = namedtuple("SiteResult", "site url_count files seconds error")
+
+
+class FairShare:
+    """Splits a request budget evenly between the sites being crawled."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def join(self):
+        with self._lock:
+            self.active += 1
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def share(self):
+        """Requests one site may have in flight right now."""
+        return max(1, math.ceil(self.budget / max(1, self.active)))
+
+
+def crawl_sites(sites, budget=64, max_sites=32, **crawl_options):
+    """Crawl sites concurrently and yield a SiteResult as each one finishes.
+
+    budget caps the page requests in flight across all sites and max_sites
+    the sites crawled at the same time. crawl_options are passed on to
+    crawl_website (max_depth, resume, ...). A failing site is reported in
+    its SiteResult and does not stop the others.
+    """
+    fair_share = FairShare(budget)
+    with ThreadPoolExecutor(max_workers=budget, thread_name_prefix="fetch") as fetch_pool, \
+            ThreadPoolExecutor(max_workers=max_sites, thread_name_prefix="site") as site_pool:
+        futures = [site_pool.submit(_crawl_site, site, fetch_pool, fair_share, crawl_options)
+                   for site in sites]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _crawl_site(site, fetch_pool, fair_share, crawl_options):
+    start = time.monotonic()
+    fair_share.join()
+    try:
+        with SitemapWriter(site.sitemap_file) as writer:
+            crawl_website(site.url, state_file=site.state_file, sink=writer,
+                          executor=fetch_pool, share=fair_share.share, **crawl_options)
+    except Exception as e:
+        logger.error(f"Crawl of {site.url} failed: {e}")
+        return SiteResult(site, 0, [], time.monotonic() - start, e)
+    finally:
+        fair_share.leave()
+    return SiteResult(site, writer.url_count, writer.files, time.monotonic() - start, None)
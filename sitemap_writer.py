@@ -0,0 +1,123 @@
+"""Streaming sitemap writer.
+
+URLs are written as they arrive, escaped for XML. Output rolls over to a
+new file at the protocol limits (50,000 URLs or 50 MB uncompressed per
+file), files can be gzipped, and when more than one file is produced a
+sitemap index is written in their place.
+"""
+import gzip
+import os
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape
+
+MAX_URLS = 50_000
+MAX_BYTES = 50 * 1024 * 1024
+NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+URLSET_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 f'<urlset xmlns="{NAMESPACE}">\n').encode("utf-8")
+URLSET_FOOTER = b"</urlset>\n"
+
+
+def xml_escape(value):
+    return escape(value, {'"': "&quot;", "'": "&apos;"})
+
+
+class SitemapWriter:
+    """Write sitemap entries to file_name, sharding and gzipping as needed.
+
+    Shards are named after file_name (sitemap-1.xml, sitemap-2.xml, ...).
+    If everything fits in one shard it is renamed to file_name (plus .gz when
+    compressing); otherwise file_name becomes a sitemap index whose <loc>s
+    are the shard names joined to sitemap_base_url, the URL the files will
+    be served from. The protocol requires absolute <loc>s, so
+    sitemap_base_url defaults to the root of the site of the first URL
+    added.
+    """
+
+    def __init__(self, file_name="sitemap.xml", gzip_output=False, max_urls=MAX_URLS,
+                 max_bytes=MAX_BYTES, sitemap_base_url=None):
+        self.file_name = file_name
+        self.gzip_output = gzip_output
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.sitemap_base_url = sitemap_base_url
+        self.url_count = 0
+        self.files = []
+        self._file = None
+        self._file_urls = 0
+        self._file_bytes = 0
+
+    def add(self, url, lastmod=None, changefreq=None, priority=None):
+        entry = f"  <url>\n    <loc>{xml_escape(url)}</loc>\n"
+        if lastmod:
+            entry += f"    <lastmod>{xml_escape(lastmod)}</lastmod>\n"
+        if changefreq:
+            entry += f"    <changefreq>{xml_escape(changefreq)}</changefreq>\n"
+        if priority:
+            entry += f"    <priority>{xml_escape(priority)}</priority>\n"
+        entry = (entry + "  </url>\n").encode("utf-8")
+        if self.sitemap_base_url is None:
+            self.sitemap_base_url = urljoin(url, "/")
+
+        if self._file is not None and (
+                self._file_urls >= self.max_urls
+                or self._file_bytes + len(entry) + len(URLSET_FOOTER) > self.max_bytes):
+            self._finish_file()
+        if self._file is None:
+            self._start_file()
+
+        self._file.write(entry)
+        self._file_urls += 1
+        self._file_bytes += len(entry)
+        self.url_count += 1
+
+    def _shard_name(self, number):
+        root, ext = os.path.splitext(self.file_name)
+        name = f"{root}-{number}{ext or '.xml'}"
+        return name + ".gz" if self.gzip_output else name
+
+    def _start_file(self):
+        path = self._shard_name(len(self.files) + 1)
+        self._file = gzip.open(path, "wb") if self.gzip_output else open(path, "wb")
+        self._file.write(URLSET_HEADER)
+        self._file_urls = 0
+        self._file_bytes = len(URLSET_HEADER)
+        self.files.append(path)
+
+    def _finish_file(self):
+        self._file.write(URLSET_FOOTER)
+        self._file.close()
+        self._file = None
+
+    def close(self):
+        """Finish the last shard and write the index if there are several."""
+        if self._file is None and not self.files:
+            self._start_file()  # an empty but valid sitemap
+        if self._file is not None:
+            self._finish_file()
+
+        if len(self.files) == 1:
+            final_name = self.file_name + ".gz" if self.gzip_output else self.file_name
+            os.replace(self.files[0], final_name)
+            self.files = [final_name]
+        else:
+            self._write_index()
+
+    def _write_index(self):
+        now = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+        with open(self.file_name, "w", encoding="utf-8") as index:
+            index.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            index.write(f'<sitemapindex xmlns="{NAMESPACE}">\n')
+            for path in self.files:
+                loc = urljoin(self.sitemap_base_url, os.path.basename(path))
+                index.write(f"  <sitemap>\n    <loc>{xml_escape(loc)}</loc>\n"
+                            f"    <lastmod>{now}</lastmod>\n  </sitemap>\n")
+            index.write("</sitemapindex>\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,66 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from main import crawl_website
+
+PAGES = {
+    "/": '<a href="/dept/">Department</a>',
+    "/dept/": '<a href="faculty.html">Faculty</a>',
+    "/dept/faculty.html": "<p>Faculty</p>",
+    "/orphan.html": '<a href="/orphan-child.html">Child</a>',
+    "/orphan-child.html": "<p>Only linked from a page nothing links to</p>",
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/sitemap.xml":
+            body = (f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                    f'<url><loc>http://{self.headers["Host"]}/orphan.html</loc>'
+                    f'<lastmod>2024-01-01</lastmod></url></urlset>').encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = PAGES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = f"<html><body>{body}</body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_relative_links_resolve_under_directory(site):
+    sitemap = crawl_website(site, max_depth=2, max_workers=2, use_sitemaps=False, respect_robots=False)
+    assert site + "dept/faculty.html" in sitemap
+    assert site + "faculty.html" not in sitemap
+
+
+def test_sitemap_seeds_are_fetched(site, tmp_path):
+    sitemap = crawl_website(site, max_depth=1, max_workers=2, respect_robots=False,
+                            state_file=str(tmp_path / "state.db"))
+    assert site + "orphan.html" in sitemap
+    assert site + "orphan-child.html" in sitemap
@@ -0,0 +1,19 @@
+from crawl_traps import PARAMETER_BUDGET, TEMPLATE_BUDGET, TrapDetector
+
+
+def test_article_listing_is_not_cut_short():
+    traps = TrapDetector()
+    reasons = [traps.check(f"https://example.edu/news.php?id={n}") for n in range(500)]
+    assert reasons == [None] * 500
+
+
+def test_template_budget_still_applies():
+    traps = TrapDetector()
+    reasons = [traps.check(f"https://example.edu/news.php?id={n}") for n in range(1001)]
+    assert reasons[-1] == TEMPLATE_BUDGET
+
+
+def test_path_actions_have_their_own_budget():
+    traps = TrapDetector()
+    reasons = [traps.check(f"https://example.edu/section{n}/+login") for n in range(101)]
+    assert reasons[-1] == PARAMETER_BUDGET
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pdf_cache
+from pdf_cache import PdfMarkdownCache
+
+PDF_URL = "https://example.edu/files/brochure.pdf"
+
+
+class FakeDownload:
+    source = b"%PDF"
+    sha256 = "0" * 64
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def test_resolved_pdf_is_not_checked_again(tmp_path, monkeypatch):
+    heads = []
+
+    def head(url):
+        heads.append(url)
+        return SimpleNamespace(ok=True, headers={"ETag": '"v1"'})
+
+    def convert(source, path):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("## Page 1\n")
+
+    monkeypatch.setattr(pdf_cache.http_client, "head", head)
+    cache = PdfMarkdownCache(str(tmp_path))
+    paths = {cache.get(PDF_URL, lambda url: FakeDownload(), convert) for _ in range(5)}
+    assert len(paths) == 1
+    assert len(heads) == 1
+    assert (cache.misses, cache.hits) == (1, 4)
@@ -0,0 +1,29 @@
+import os
+import random
+import sys
+
+import pdf_extract
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from synthetic_site import build_pdf  # noqa: E402
+
+PDF = build_pdf("Document 1", random.Random(1), 8 * 1024)
+
+
+def test_text_is_kept_when_pdfplumber_cannot_open(monkeypatch):
+    def fail(*args, **kwargs):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(pdf_extract.pdfplumber, "open", fail)
+    markdown = "".join(pdf_extract.iter_pdf_markdown(PDF))
+    assert "## Page 1" in markdown
+    assert "Document 1" in markdown
+
+
+def test_text_is_kept_when_table_extraction_fails(monkeypatch):
+    def fail(self, *args, **kwargs):
+        raise IndexError("page out of range")
+
+    monkeypatch.setattr(pdf_extract.pdfplumber.page.Page, "extract_tables", fail)
+    markdown = "".join(pdf_extract.iter_pdf_markdown(PDF))
+    assert "Document 1" in markdown
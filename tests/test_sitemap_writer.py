@@ -0,0 +1,12 @@
+import xml.etree.ElementTree as ET
+
+from sitemap_writer import NAMESPACE, SitemapWriter
+
+
+def test_index_locs_are_absolute(tmp_path):
+    file_name = str(tmp_path / "sitemap.xml")
+    with SitemapWriter(file_name, max_urls=2) as writer:
+        for n in range(5):
+            writer.add(f"https://example.edu/dept/page{n}.html")
+    locs = [loc.text for loc in ET.parse(file_name).iter(f"{{{NAMESPACE}}}loc")]
+    assert locs == [f"https://example.edu/sitemap-{n}.xml" for n in (1, 2, 3)]
@@ -0,0 +1,23 @@
+import io
+import os
+
+import tree
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_text_matches_committed_folder_structure():
+    trie = tree.build_trie(os.path.join(REPO_DIR, "sitemap_fixed.xml"))
+    out = io.StringIO()
+    tree.render_text(trie, out)
+    with open(os.path.join(REPO_DIR, "folder_structure.txt"), encoding="utf-8") as file:
+        assert out.getvalue() == file.read()
+
+
+def test_trailing_slash_makes_a_directory():
+    trie = tree.PathTrie()
+    trie.add("https://example.edu/docs/v1.2/")
+    trie.add("https://example.edu/docs/guide.pdf")
+    children = trie.root.children["docs"].children
+    assert not tree.is_file("v1.2", children["v1.2"])
+    assert tree.is_file("guide.pdf", children["guide.pdf"])
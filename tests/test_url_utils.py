@@ -0,0 +1,24 @@
+from url_utils import canonicalize_url
+
+WAYBACK = "https://web.archive.org/web/20220703201425/https://nitt.wiki/Main_Page"
+
+
+def test_keeps_trailing_slash():
+    assert canonicalize_url("https://example.edu/dept/") == "https://example.edu/dept/"
+    assert canonicalize_url("https://example.edu/dept") == "https://example.edu/dept"
+
+
+def test_keeps_double_slashes_in_path():
+    assert canonicalize_url(WAYBACK) == WAYBACK
+
+
+def test_normalizes_spellings():
+    assert (canonicalize_url("HTTP://Example.edu:80/a?b=2&a=1#top")
+            == "http://example.edu/a?a=1&b=2")
+    assert (canonicalize_url("http://www.example.edu/a", "https://example.edu/")
+            == "https://example.edu/a")
+
+
+def test_keeps_query_encoding():
+    assert (canonicalize_url("https://example.edu/search?q=a%2Fb+c&flag&x=%zz")
+            == "https://example.edu/search?flag&q=a%2Fb+c&x=%zz")
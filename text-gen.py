@@ -1,12 +1,33 @@
-import requests
+import http_client
+import metrics
+from page_extract import fetch_page_content
+from pdf_cache import PdfMarkdownCache
+from pdf_extract import write_pdf_markdown
+from output_sink import FilePart, OutputSink
+from record_store import DEFAULT_RECORD_FILE, RecordSink
+from simhash import SimHashIndex, fingerprint
+import argparse
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
-import fitz  # PyMuPDF
 import re
 from tabulate import tabulate
-import pdfplumber
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+MAX_WORKERS = 10  # Upper bound; http_client's rate limiter decides how many hit each host at once
+# PDF parsing is CPU-bound, so it runs in a process pool with one process per core.
+# PDF_IO_WORKERS threads download PDFs and wait for the pool, and at most
+# PDF_QUEUE_SIZE PDF links wait for them; page workers block when it is full.
+CPU_WORKERS = os.cpu_count() or 1
+PDF_IO_WORKERS = CPU_WORKERS * 2
+PDF_QUEUE_SIZE = 100
+
+pdf_cache = PdfMarkdownCache("pdf_cache")
 
 # Create a logger
 logger = logging.getLogger(__name__)
@@ -21,9 +42,12 @@ formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(messag
 file_handler.setFormatter(formatter)
 stream_handler.setFormatter(formatter)
 
-# Add the handlers to the logger
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+# Add the handlers to the logger through a queue, so the file and terminal
+# writes happen on a background thread instead of in the workers
+log_queue = queue.Queue()
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener.start()
 
 def parse_sitemap(sitemap_file):
     try:
@@ -47,134 +71,160 @@ def extract_table_from_text(text):
     table_data = [row for row in table_data if len(row) == most_common_count]
 
     if len(table_data) < 2:
-        logger.info("No valid tables found in text.")
+        logger.debug("No valid tables found in text.")
         return None
 
-    logger.info("Extracted table from text.")
+    logger.debug("Extracted table from text.")
     return tabulate(table_data, headers="firstrow", tablefmt="github")
 
-def convert_pdf_to_markdown(pdf_url):
-    try:
-        response = requests.get(pdf_url)
-        response.raise_for_status()
-
-        pdf_path = "temp.pdf"
-        with open(pdf_path, "wb") as file:
-            file.write(response.content)
-
-        tables_markdown = extract_table_from_pdf(pdf_path)
-        pdf_doc = fitz.open(pdf_path)
-        markdown_content = ""
-
-        for page_num in range(pdf_doc.page_count):
-            page = pdf_doc.load_page(page_num)
-            text = page.get_text("text")
-            markdown_content += f"## Page {page_num + 1}\n\n"
+def download_pdf(pdf_url):
+    with metrics.timer("stage_seconds", stage="pdf_download"):
+        pdf = http_client.download(pdf_url, content_types=http_client.PDF_CONTENT_TYPES)
+    metrics.count("bytes_total", pdf.size, stage="pdf_download")
+    return pdf
 
-            if tables_markdown:
-                for i, table in enumerate(tables_markdown, start=1):
-                    markdown_content += f"### Table {i}\n{table}\n\n"
+def convert_pdf_to_markdown(pdf_url, convert=write_pdf_markdown):
+    """Path of a cached file holding the PDF's Markdown, or None on failure."""
+    def timed_convert(pdf_data, path):
+        with metrics.timer("stage_seconds", stage="pdf_extract"):
+            convert(pdf_data, path)
 
-            markdown_content += text + "\n\n"
-
-        logger.info(f"Converted PDF to Markdown: {pdf_url}")
-        return markdown_content
+    try:
+        # Each unique PDF is downloaded and converted once, across pages and runs
+        markdown_path = pdf_cache.get(pdf_url, download_pdf, timed_convert)
+        metrics.count("pdfs_total", result="converted" if markdown_path else "empty")
+        logger.debug(f"Converted PDF to Markdown: {pdf_url}")
+        return markdown_path
     except Exception as e:
+        metrics.count("pdfs_total", result="error")
         logger.error(f"Error processing PDF from {pdf_url}: {e}")
-        return ""
+        return None
 
 def scrape_page(url):
+    """Fetch and parse url once, returning its PageContent, or None if it is not HTML or failed."""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        text_content = "\n".join([p.get_text() for p in soup.find_all("p")])
-
-        tables = []
-        for table in soup.find_all("table"):
-            rows = []
-            for tr in table.find_all("tr"):
-                cells = [cell.get_text(strip=True) for cell in tr.find_all(["th", "td"])]
-                rows.append(cells)
-            if rows:
-                markdown_table = tabulate(rows, headers="firstrow", tablefmt="github")
-                tables.append(markdown_table)
-
-        logger.info(f"Scraped URL: {url}")
-        return text_content, tables
+        content = fetch_page_content(url)
+        if content is None:
+            metrics.count("pages_total", result="not_html")
+            logger.debug(f"Skipping non-HTML URL: {url}")
+            return None
+
+        metrics.count("pages_total", result="scraped")
+        logger.debug(f"Scraped URL: {url}")
+        return content
     except Exception as e:
+        metrics.count("pages_total", result="error")
         logger.error(f"Error scraping URL {url}: {e}")
-        return "", []
-
-def extract_pdfs(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-        pdf_links = []
-
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            if href.endswith(".pdf"):
-                pdf_url = href if href.startswith("http") else requests.compat.urljoin(url, href)
-                pdf_links.append(pdf_url)
-
-        logger.info(f"Extracted PDFs from URL: {url}")
-        return pdf_links
-    except Exception as e:
-        logger.error(f"Error extracting PDFs from {url}: {e}")
-        return []
-
-def extract_table_from_pdf(pdf_path):
-    try:
-        tables_markdown = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    if table:
-                        markdown_table = tabulate(table, headers="firstrow", tablefmt="github")
-                        tables_markdown.append(markdown_table)
-        logger.info(f"Extracted tables from PDF: {pdf_path}")
-        return tables_markdown
-    except Exception as e:
-        logger.error(f"Error extracting tables from PDF {pdf_path}: {e}")
-        return []
-
-def save_to_file(content, file_name="final_output.txt"):
-    try:
-        with open(file_name, "a", encoding="utf-8") as file:
-            file.write(content + "\n\n")
-        logger.info(f"Content saved to {file_name}")
-    except Exception as e:
-        logger.error(f"Error saving to file {file_name}: {e}")
+        return None
 
-def process_url(url):
-    text_content, tables = scrape_page(url)
+def process_pdf(pdf_url, sink, convert=write_pdf_markdown, source=None):
+    logger.debug(f"Processing PDF: {pdf_url}")
+    markdown_path = convert_pdf_to_markdown(pdf_url, convert)
+    if not markdown_path:
+        logger.warning(f"Failed to extract Markdown from PDF: {pdf_url}")
+    else:
+        sink.write_pdf(pdf_url, FilePart(markdown_path), source)
+
+def page_fingerprint(content):
+    """SimHash of a page's text and table cells, or None if there is too little text."""
+    cells = " ".join(cell or "" for rows in content.tables for row in rows for cell in row)
+    return fingerprint(f"{content.text}\n{cells}")
+
+def process_url(url, sink, pdf_queue=None, near_duplicates=None):
+    content = scrape_page(url)
+    if content is None:
+        return
 
-    if text_content:
-        save_to_file(f"# Content from {url}\n\n{text_content}")
+    # A page that renders almost the same text as one already written (login,
+    # search and view variants of a section) is written only as a reference
+    # to that page, and its tables and PDFs are not processed again.
+    value = page_fingerprint(content) if near_duplicates is not None else None
+    original = near_duplicates.add(value, url) if value is not None else None
+    if original is not None:
+        metrics.count("near_duplicates_total")
+        logger.debug(f"Near-duplicate of {original}: {url}")
+        sink.write_duplicate(url, original, content.fetch)
+        return
 
-    if tables:
-        for i, table in enumerate(tables, start=1):
-            save_to_file(f"# Table {i} from {url}\n\n{table}")
+    # The page's text and tables go out as one record
+    sink.write_page(url, content)
 
-    pdf_links = extract_pdfs(url)
-    if pdf_links:
-        logger.info(f"Found {len(pdf_links)} PDFs on {url}. Processing...")
+    if content.pdf_links:
+        logger.debug(f"Found {len(content.pdf_links)} PDFs on {url}. Processing...")
 
-        for pdf_url in pdf_links:
-            logger.info(f"Processing PDF: {pdf_url}")
-            markdown_content = convert_pdf_to_markdown(pdf_url)
-            if markdown_content:
-                save_to_file(f"# Content from PDF: {pdf_url}\n\n{markdown_content}")
+        for pdf_url in content.pdf_links:
+            if pdf_queue is None:
+                process_pdf(pdf_url, sink, source=url)
             else:
-                logger.warning(f"Failed to extract Markdown from PDF: {pdf_url}")
-
-def main(sitemap_file):
+                pdf_queue.put((pdf_url, url))  # blocks while the PDF stage is backed up
+
+class PdfPool:
+    """Process pool for PDF parsing that replaces itself when a child dies.
+
+    A child killed mid-parse (a crash in PyMuPDF on a malformed PDF, the OOM
+    killer) breaks a ProcessPoolExecutor for good; the PDF it was parsing
+    fails, and the next one gets a fresh pool. Children are started by a
+    fork server, not forked from this process while its threads hold locks.
+    """
+
+    def __init__(self, max_workers=CPU_WORKERS):
+        self.max_workers = max_workers
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context)
+
+    def convert(self, pdf_data, path):
+        """Write the Markdown of pdf_data to path in a child process."""
+        pool = self._pool
+        try:
+            future = pool.submit(write_pdf_markdown, pdf_data, path)
+        except BrokenProcessPool:
+            # Broken before this PDF was handed over, so it can still be parsed
+            pool = self._replace(pool)
+            future = pool.submit(write_pdf_markdown, pdf_data, path)
+        try:
+            future.result()
+        except BrokenProcessPool:
+            self._replace(pool)
+            raise
+
+    def _replace(self, broken):
+        with self._lock:
+            if self._pool is broken:
+                logger.error("A PDF parsing process died; starting a new pool")
+                metrics.count("pdf_pool_restarts_total")
+                self._pool = self._new_pool()
+                broken.shutdown(wait=False)
+            return self._pool
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+def pdf_worker(pdf_queue, pdf_pool, sink):
+    """Take PDF links off the queue, download them here and parse them in the process pool."""
+    while True:
+        item = pdf_queue.get()
+        if item is None:
+            return
+        pdf_url, source = item
+        try:
+            process_pdf(pdf_url, sink, pdf_pool.convert, source)
+        except Exception as e:
+            # A dead worker would leave page workers blocked on the full queue
+            logger.error(f"Error writing PDF {pdf_url}: {e}")
+
+def main(sitemap_file, output_file="final_output.txt", shards=1, output_format="text",
+         near_duplicate_distance=3):
     logger.info("Starting scraping process...")
 
     urls = parse_sitemap(sitemap_file)
@@ -185,11 +235,70 @@ def main(sitemap_file):
     total_urls = len(urls)
     logger.info(f"Found {total_urls} URLs in the sitemap.")
 
-    with ThreadPoolExecutor(max_workers=10) as executor:  # Adjust workers as needed
-        executor.map(process_url, urls)
+    http_client.configure(pool_size=MAX_WORKERS + PDF_IO_WORKERS)
+    pdf_queue = queue.Queue(maxsize=PDF_QUEUE_SIZE)
+    near_duplicates = SimHashIndex(near_duplicate_distance) if near_duplicate_distance >= 0 else None
+
+    sink_class = RecordSink if output_format == "jsonl" else OutputSink
+    with sink_class(output_file, shards=shards) as sink, \
+            PdfPool(CPU_WORKERS) as pdf_pool:
+        metrics.gauge("pdf_queue_depth", pdf_queue.qsize)
+        metrics.gauge("output_queue_depth", sink.pending)
+        pdf_threads = [threading.Thread(target=pdf_worker, args=(pdf_queue, pdf_pool, sink), daemon=True)
+                       for _ in range(PDF_IO_WORKERS)]
+        for thread in pdf_threads:
+            thread.start()
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for _ in executor.map(lambda url: process_url(url, sink, pdf_queue, near_duplicates), urls):
+                pass
+
+        for _ in pdf_threads:
+            pdf_queue.put(None)
+        for thread in pdf_threads:
+            thread.join()
+
+    logger.info(f"Wrote {sink.records} records to {', '.join(sink.file_names)}")
+    for host, rate in http_client.rates().items():
+        logger.info(f"Rate for {host}: {rate}")
 
     logger.info("Scraping process completed.")
 
 if __name__ == "__main__":
-    sitemap_file = "sitemap_cleaned.xml"
-    main(sitemap_file)
+    parser = argparse.ArgumentParser(description="Scrape the pages and PDFs listed in a sitemap into text.")
+    parser.add_argument("sitemap_file", nargs="?", default="sitemap_cleaned.xml")
+    parser.add_argument("--format", choices=("text", "jsonl"), default="text",
+                        help="jsonl: gzipped JSON records plus a URL index, see record_store.py")
+    parser.add_argument("--output", help=f"output file (default: final_output.txt, or {DEFAULT_RECORD_FILE} for jsonl)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="spread the output over this many files (output-0.txt, output-1.txt, ...)")
+    parser.add_argument("--near-duplicate-distance", type=int, default=3,
+                        help="write pages whose SimHash is within this many bits of an earlier page as a "
+                             "reference to it; -1 writes every page in full (default: 3)")
+    parser.add_argument("--max-page-mb", type=float, default=10,
+                        help="skip pages larger than this many megabytes (default: 10)")
+    parser.add_argument("--max-pdf-mb", type=float, default=200,
+                        help="skip PDFs larger than this many megabytes; PDFs over "
+                             f"{http_client.SPOOL_THRESHOLD // 1024 ** 2} MB are spooled to disk (default: 200)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the final metrics to FILE (JSON for *.json, Prometheus text otherwise)")
+    parser.add_argument("--metrics-interval", type=float, default=30,
+                        help="log a metrics summary every this many seconds, 0 to disable (default: 30)")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and save the stats to FILE")
+    args = parser.parse_args()
+    output_file = args.output or (DEFAULT_RECORD_FILE if args.format == "jsonl" else "final_output.txt")
+    page_cap = int(args.max_page_mb * 1024 ** 2)
+    pdf_cap = int(args.max_pdf_mb * 1024 ** 2)
+    http_client.configure(max_bytes={**{content_type: page_cap for content_type in http_client.HTML_CONTENT_TYPES},
+                                     **{content_type: pdf_cap for content_type in http_client.PDF_CONTENT_TYPES}})
+    metrics.gauge("pdf_cache_hits", lambda: pdf_cache.hits)
+    metrics.gauge("pdf_cache_misses", lambda: pdf_cache.misses)
+    try:
+        with metrics.profiled(args.profile, emit=logger.info), \
+                metrics.Reporter(args.metrics_interval, emit=logger.info):
+            main(args.sitemap_file, output_file, args.shards, args.format, args.near_duplicate_distance)
+        if args.metrics:
+            metrics.dump(args.metrics)
+            logger.info(f"Metrics saved to {args.metrics}")
+    finally:
+        log_listener.stop()
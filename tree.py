@@ -1,28 +1,218 @@
+"""Folder structure of the URL paths in a sitemap.
+
+The sitemap is streamed into a trie of path segments, one node per
+distinct path prefix, each counting the URLs at or below it. From there
+the structure is either printed like the `tree` command (--format text),
+written as JSON or as a collapsible HTML list, or materialized as empty
+directories and placeholder files under folder_structure/ (--format dirs,
+the default, for use with tree.sh).
+
+Usage:
+    python3 tree.py sitemap_fixed.xml --format text --counts --depth 3 --output folder_structure.txt
+    python3 tree.py sitemap_fixed.xml --format html --output folder_structure.html
+"""
+import argparse
+import html
+import json
 import os
+import re
+import sys
 import urllib.parse
-import xml.etree.ElementTree as ET
-
-xml_file = "sitemap_fixed.xml" 
-tree = ET.parse(xml_file)
-root = tree.getroot()
 
-namespace = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+from clean import iter_sitemap_entries
 
+xml_file = "sitemap_fixed.xml"
 output_dir = "folder_structure"
-os.makedirs(output_dir, exist_ok=True)
-
-for url in root.findall("ns:url/ns:loc", namespace):
-    loc = url.text
-    if loc:
-        parsed_url = urllib.parse.urlparse(loc)
-        path = parsed_url.path.lstrip("/")  
-        full_path = os.path.join(output_dir, path)
-
-        if "." in os.path.basename(full_path):
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, "w") as f:
-                f.write(f"Placeholder for {os.path.basename(full_path)}")
-        else:
-            os.makedirs(full_path, exist_ok=True)
-
-print(f"Folder structure created in: {output_dir}")
+
+
+class Node:
+    __slots__ = ("children", "count", "is_url", "is_dir")
+
+    def __init__(self):
+        self.children = None  # segment -> Node, created on the first child
+        self.count = 0  # URLs at or below this node
+        self.is_url = False
+        self.is_dir = False  # a URL ended here with a trailing slash
+
+
+class PathTrie:
+    """Trie of URL path segments. Segment strings are interned, so names
+    repeated under many sections (+login, +search, index.html) are stored once."""
+
+    def __init__(self):
+        self.root = Node()
+        self.nodes = 1
+
+    def add(self, url):
+        """Add the path of url; returns False if it was added before."""
+        path_string = urllib.parse.urlparse(url).path
+        segments = [segment for segment in path_string.split("/") if segment]
+        path = [self.root]
+        node = self.root
+        for segment in segments:
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[sys.intern(segment)] = Node()
+                self.nodes += 1
+            node = child
+            path.append(node)
+        if path_string.endswith("/"):
+            node.is_dir = True
+        if node.is_url:
+            return False
+        node.is_url = True
+        for visited in path:
+            visited.count += 1
+        return True
+
+
+def build_trie(sitemap_file):
+    trie = PathTrie()
+    # <loc>s are used as written, like the original script: a trailing space is part of the name
+    for entry in iter_sitemap_entries(sitemap_file, strip=False):
+        if entry.get("loc"):
+            trie.add(entry["loc"])
+    return trie
+
+
+def is_file(name, node):
+    """Same rule as the materialized structure: a leaf whose name has a dot is
+    a file, unless a URL ended in it with a trailing slash."""
+    return node.children is None and not node.is_dir and "." in name
+
+
+def collation_key(name):
+    """Sort key approximating `tree` in UTF-8 locales: letters and digits
+    compared without case first, then lowercase before uppercase, then
+    punctuation before the letter or digit at the same position."""
+    alnum = re.sub(r"[^0-9A-Za-z]", "", name)
+    return (alnum.lower(), [c.isupper() for c in alnum],
+            [(c.isalnum(), c.lower()) for c in name])
+
+
+def sorted_children(node):
+    """Children in the order `tree` lists them."""
+    if not node.children:
+        return []
+    return sorted(node.children.items(), key=lambda item: collation_key(item[0]))
+
+
+def render_text(trie, file, max_depth=None, counts=False, root_name=output_dir):
+    """Write the trie like the output of `tree`, down to max_depth levels.
+
+    Continuing branches are indented with "│", two no-break spaces and a
+    space, as `tree` does in UTF-8 locales.
+    """
+    totals = {"directories": 0, "files": 0}
+
+    def label(name, node):
+        return f"{name} ({node.count})" if counts else name
+
+    def walk(node, prefix, depth):
+        if max_depth is not None and depth >= max_depth:
+            return
+        children = sorted_children(node)
+        for i, (name, child) in enumerate(children):
+            last = i == len(children) - 1
+            totals["files" if is_file(name, child) else "directories"] += 1
+            file.write(f"{prefix}{'└── ' if last else '├── '}{label(name, child)}\n")
+            walk(child, prefix + ("    " if last else "│\u00a0\u00a0 "), depth + 1)
+
+    file.write(label(root_name, trie.root) + "\n")
+    walk(trie.root, "", 0)
+    file.write(f"\n{totals['directories']} directories, {totals['files']} files\n")
+
+
+def render_json(trie, file, max_depth=None, root_name=output_dir):
+    """Write the trie as nested {"name", "count", "url", "children"} objects."""
+    def walk(name, node, depth):
+        file.write(f'{{"name": {json.dumps(name)}, "count": {node.count}, "url": {json.dumps(node.is_url)}')
+        children = sorted_children(node) if max_depth is None or depth < max_depth else []
+        if children:
+            file.write(', "children": [')
+            for i, (child_name, child) in enumerate(children):
+                if i:
+                    file.write(", ")
+                walk(child_name, child, depth + 1)
+            file.write("]")
+        file.write("}")
+
+    walk(root_name, trie.root, 0)
+    file.write("\n")
+
+
+def render_html(trie, file, max_depth=None, counts=True, root_name=output_dir):
+    """Write the trie as a nested list; directories are collapsible <details> elements."""
+    def label(name, node):
+        return html.escape(name) + (f" <small>({node.count})</small>" if counts else "")
+
+    def walk(name, node, depth):
+        children = sorted_children(node) if max_depth is None or depth < max_depth else []
+        if not children:
+            file.write(f"<li>{label(name, node)}</li>\n")
+            return
+        file.write(f"<li><details{' open' if depth == 0 else ''}><summary>{label(name, node)}</summary><ul>\n")
+        for child_name, child in children:
+            walk(child_name, child, depth + 1)
+        file.write("</ul></details></li>\n")
+
+    file.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+               f"<title>{html.escape(root_name)}</title></head><body><ul>\n")
+    walk(root_name, trie.root, 0)
+    file.write("</ul></body></html>\n")
+
+
+def materialize(trie, directory=output_dir):
+    """Create the structure on disk: a directory per path segment and a
+    placeholder file per file name. Only leaf directories and directories
+    holding files are created explicitly, since makedirs creates parents."""
+    os.makedirs(directory, exist_ok=True)
+    stack = [(directory, trie.root)]
+    while stack:
+        path, node = stack.pop()
+        children = node.children or {}
+        if any(is_file(name, child) for name, child in children.items()):
+            os.makedirs(path, exist_ok=True)
+        for name, child in children.items():
+            full_path = os.path.join(path, name)
+            if is_file(name, child):
+                with open(full_path, "w") as f:
+                    f.write(f"Placeholder for {name}")
+            elif child.children is None:
+                os.makedirs(full_path, exist_ok=True)
+            else:
+                stack.append((full_path, child))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the folder structure of the URLs in a sitemap.")
+    parser.add_argument("sitemap_file", nargs="?", default=xml_file,
+                        help="sitemap or sitemap index, optionally gzipped")
+    parser.add_argument("--format", choices=("dirs", "text", "json", "html"), default="dirs",
+                        help=f"dirs: create the structure under {output_dir}/ (default); "
+                             "text, json, html: render it straight from memory")
+    parser.add_argument("--output", help="file for text, json and html output (default: stdout)")
+    parser.add_argument("--depth", type=int, help="render only this many levels")
+    parser.add_argument("--counts", action="store_true", help="show the number of URLs under each node")
+    args = parser.parse_args()
+
+    trie = build_trie(args.sitemap_file)
+    if args.format == "dirs":
+        materialize(trie, output_dir)
+        print(f"Folder structure created in: {output_dir}")
+    else:
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            if args.format == "text":
+                render_text(trie, out, args.depth, args.counts)
+            elif args.format == "json":
+                render_json(trie, out, args.depth)
+            else:
+                render_html(trie, out, args.depth, args.counts)
+        finally:
+            if args.output:
+                out.close()
+        if args.output:
+            print(f"Folder structure of {trie.root.count} URLs written to {args.output}")
@@ -0,0 +1,144 @@
+"""URL canonicalization and compact seen-sets for the crawler."""
+import hashlib
+import math
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def site_key(netloc):
+    """Host identity used for same-site checks: lowercase, no default port, no www."""
+    host = netloc.lower().rsplit("@", 1)[-1]
+    for port in DEFAULT_PORTS.values():
+        host = host.removesuffix(f":{port}")
+    return host.removeprefix("www.")
+
+
+def same_site(url, base_url):
+    return site_key(urlsplit(url).netloc) == site_key(urlsplit(base_url).netloc)
+
+
+def canonicalize_url(url, base_url=None):
+    """Normalize url so that equivalent spellings compare equal.
+
+    Drops the fragment, lowercases scheme and host, removes default ports
+    and sorts query parameters, keeping their encoding as is. When base_url
+    is given and url is on the same site, the scheme and host (http vs
+    https, www vs bare) are rewritten to those of base_url. The path is kept
+    as is: /dept and /dept/ resolve relative links differently, and archive
+    URLs embed // in their path.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if netloc.endswith(f":{DEFAULT_PORTS.get(scheme)}"):
+        netloc = netloc.rsplit(":", 1)[0]
+
+    if base_url is not None:
+        base = urlsplit(base_url)
+        if site_key(netloc) == site_key(base.netloc):
+            scheme, netloc = base.scheme.lower(), base.netloc.lower()
+
+    path = parts.path or "/"
+
+    # The raw pairs are sorted without decoding them: servers may treat
+    # ?flag and ?flag=, or %2F and /, as different resources.
+    query = "&".join(sorted(parts.query.split("&")))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_key(url, ignore_case=False):
+    """Dedup key of an already canonical URL."""
+    return url.lower() if ignore_case else url
+
+
+class ExactSeenSet:
+    """Seen-set that keeps the full keys."""
+
+    def __init__(self):
+        self._items = set()
+
+    def add(self, key):
+        """Add key, returning True if it was not seen before."""
+        if key in self._items:
+            return False
+        self._items.add(key)
+        return True
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+class FingerprintSeenSet(ExactSeenSet):
+    """Seen-set that keeps a 64-bit fingerprint per key instead of the string.
+
+    Uses a fraction of the memory of full URLs; two different URLs collide
+    with probability about n^2 / 2^65, which is negligible for any crawl.
+    """
+
+    def add(self, key):
+        return super().add(_fingerprint(key))
+
+    def __contains__(self, key):
+        return super().__contains__(_fingerprint(key))
+
+
+class BloomSeenSet:
+    """Fixed-size Bloom filter for very large crawls.
+
+    Memory does not grow with the number of URLs, at the cost of wrongly
+    reporting roughly error_rate of new URLs as already seen once capacity
+    URLs have been added.
+    """
+
+    def __init__(self, capacity=10_000_000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        """Add key, returning True if it was (probably) not seen before."""
+        new = False
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self._count += 1
+        return new
+
+    def __contains__(self, key):
+        return all(self._bits[p // 8] & (1 << (p % 8)) for p in self._positions(key))
+
+    def __len__(self):
+        return self._count
+
+
+SEEN_SET_KINDS = {
+    "exact": ExactSeenSet,
+    "fingerprint": FingerprintSeenSet,
+    "bloom": BloomSeenSet,
+}
+
+
+def make_seen_set(kind="exact", **options):
+    """Create a seen-set: 'exact', 'fingerprint' or 'bloom' (capacity, error_rate)."""
+    try:
+        return SEEN_SET_KINDS[kind](**options)
+    except KeyError:
+        raise ValueError(f"Unknown seen-set kind {kind!r}; choose from {', '.join(SEEN_SET_KINDS)}")
+
+
+def _fingerprint(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
@@ -1,49 +1,25 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import argparse
 import os
+import sys
 
-def crawl_website(base_url, max_depth=2):
-    visited = set()
-    sitemap = set()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    def crawl(url, depth):
-        if depth > max_depth or url in visited:
-            return
-        visited.add(url)
-
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code != 200:
-                return
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching {url}: {e}")
-            return
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            full_url = urljoin(url, href)
-            parsed = urlparse(full_url)
-
-            if parsed.netloc == urlparse(base_url).netloc:
-                sitemap.add(full_url)
-                crawl(full_url, depth + 1)
-
-    crawl(base_url, 0)
-    return sitemap
-
-
-def save_sitemap_to_file(sitemap, file_name='sitemap.xml'):
-    with open(file_name, 'w') as file:
-        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        file.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
-        for url in sorted(sitemap):
-            file.write(f'  <url>\n    <loc>{url}</loc>\n  </url>\n')
-        file.write('</urlset>\n')
+import http_client
+from site_scheduler import Site, crawl_sites
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a sitemap for every website in urls.txt.")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the crawls recorded in the sitemaps/ state files")
+    parser.add_argument("--budget", type=int, default=64,
+                        help="page requests in flight across all sites (default: 64)")
+    parser.add_argument("--sites", type=int, default=32, help="sites crawled at the same time (default: 32)")
+    parser.add_argument("--per-host", type=int, default=16,
+                        help="most concurrent requests per host, shared by all sites on it (default: 16)")
+    args = parser.parse_args()
+    http_client.configure(pool_size=args.budget, max_per_host=args.per_host)
+
     urls_file = "urls.txt"
     output_directory = "sitemaps"
 
@@ -59,12 +35,18 @@ if __name__ == "__main__":
         print(f"Error: File '{urls_file}' not found.")
         exit(1)
 
-    for idx, website_url in enumerate(urls, 1):
-        print(f"Crawling website {idx}/{len(urls)}: {website_url}")
-        sitemap = crawl_website(website_url)
-
-        sitemap_file_name = os.path.join(output_directory, f'sitemap_{idx}.xml')
-        print(f"Found {len(sitemap)} URLs. Saving to {sitemap_file_name}...")
-        save_sitemap_to_file(sitemap, sitemap_file_name)
+    sites = [Site(website_url,
+                  os.path.join(output_directory, f'sitemap_{idx}.xml'),
+                  os.path.join(output_directory, f'crawl_state_{idx}.db'))
+             for idx, website_url in enumerate(urls, 1)]
+    print(f"Crawling {len(sites)} websites, {args.sites} at a time...")
+
+    for done, result in enumerate(crawl_sites(sites, budget=args.budget, max_sites=args.sites,
+                                              resume=args.resume), 1):
+        if result.error is not None:
+            print(f"[{done}/{len(sites)}] Failed {result.site.url}: {result.error}")
+        else:
+            print(f"[{done}/{len(sites)}] Found {result.url_count} URLs on {result.site.url} "
+                  f"in {result.seconds:.0f}s. Saved to {result.site.sitemap_file}.")
 
     print(f"All sitemaps are saved in the '{output_directory}' directory.")
@@ -1,11 +1,19 @@
-import requests
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
-import fitz  # PyMuPDF
 import re
 from tabulate import tabulate
-import pdfplumber
 import logging
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+from page_extract import fetch_page_content
+from pdf_cache import PdfMarkdownCache
+from pdf_extract import write_pdf_markdown
+
+pdf_cache = PdfMarkdownCache("pdf_cache")
 
 # Create a logger
 logger = logging.getLogger(__name__)
@@ -52,96 +60,35 @@ def extract_table_from_text(text):
     logger.info("Extracted table from text.")
     return tabulate(table_data, headers="firstrow", tablefmt="github")
 
+def download_pdf(pdf_url):
+    return http_client.download(pdf_url, content_types=http_client.PDF_CONTENT_TYPES)
+
 def convert_pdf_to_markdown(pdf_url):
+    """Path of a cached file holding the PDF's Markdown, or None on failure."""
     try:
-        response = requests.get(pdf_url)
-        response.raise_for_status()
-
-        pdf_path = "temp.pdf"
-        with open(pdf_path, "wb") as file:
-            file.write(response.content)
-
-        tables_markdown = extract_table_from_pdf(pdf_path)
-        pdf_doc = fitz.open(pdf_path)
-        markdown_content = ""
-
-        for page_num in range(pdf_doc.page_count):
-            page = pdf_doc.load_page(page_num)
-            text = page.get_text("text")
-            markdown_content += f"## Page {page_num + 1}\n\n"
-
-            if tables_markdown:
-                for i, table in enumerate(tables_markdown, start=1):
-                    markdown_content += f"### Table {i}\n{table}\n\n"
-
-            markdown_content += text + "\n\n"
-
+        # Each unique PDF is downloaded and converted once, across pages and runs
+        markdown_path = pdf_cache.get(pdf_url, download_pdf, write_pdf_markdown)
         logger.info(f"Converted PDF to Markdown: {pdf_url}")
-        return markdown_content
+        return markdown_path
     except Exception as e:
         logger.error(f"Error processing PDF from {pdf_url}: {e}")
-        return ""
+        return None
 
 def scrape_page(url):
+    """Fetch and parse url once, returning its text, Markdown tables and PDF links."""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
+        content = fetch_page_content(url)
+        if content is None:
+            logger.info(f"Skipping non-HTML URL: {url}")
+            return "", [], []
 
-        text_content = "\n".join([p.get_text() for p in soup.find_all("p")])
-
-        tables = []
-        for table in soup.find_all("table"):
-            rows = []
-            for tr in table.find_all("tr"):
-                cells = [cell.get_text(strip=True) for cell in tr.find_all(["th", "td"])]
-                rows.append(cells)
-            if rows:
-                markdown_table = tabulate(rows, headers="firstrow", tablefmt="github")
-                tables.append(markdown_table)
+        tables = [tabulate(rows, headers="firstrow", tablefmt="github") for rows in content.tables]
 
         logger.info(f"Scraped URL: {url}")
-        return text_content, tables
+        return content.text, tables, content.pdf_links
     except Exception as e:
         logger.error(f"Error scraping URL {url}: {e}")
-        return "", []
-
-def extract_pdfs(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-        pdf_links = []
-
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            if href.endswith(".pdf"):
-                pdf_url = href if href.startswith("http") else requests.compat.urljoin(url, href)
-                pdf_links.append(pdf_url)
-
-        logger.info(f"Extracted PDFs from URL: {url}")
-        return pdf_links
-    except Exception as e:
-        logger.error(f"Error extracting PDFs from {url}: {e}")
-        return []
-
-def extract_table_from_pdf(pdf_path):
-    try:
-        tables_markdown = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    if table:
-                        markdown_table = tabulate(table, headers="firstrow", tablefmt="github")
-                        tables_markdown.append(markdown_table)
-        logger.info(f"Extracted tables from PDF: {pdf_path}")
-        return tables_markdown
-    except Exception as e:
-        logger.error(f"Error extracting tables from PDF {pdf_path}: {e}")
-        return []
+        return "", [], []
 
 def save_to_file(content, file_name="final_output.txt"):
     try:
@@ -151,6 +98,17 @@ def save_to_file(content, file_name="final_output.txt"):
     except Exception as e:
         logger.error(f"Error saving to file {file_name}: {e}")
 
+def append_file_to_file(header, path, file_name="final_output.txt"):
+    """Append header and then the contents of path, streamed rather than read into memory."""
+    try:
+        with open(file_name, "a", encoding="utf-8") as file, open(path, "r", encoding="utf-8") as source:
+            file.write(header)
+            shutil.copyfileobj(source, file)
+            file.write("\n\n")
+        logger.info(f"Content saved to {file_name}")
+    except Exception as e:
+        logger.error(f"Error saving to file {file_name}: {e}")
+
 def main(sitemap_file):
     logger.info("Starting scraping process...")
 
@@ -164,7 +122,7 @@ def main(sitemap_file):
     for url in urls:
         logger.info(f"Scraping URL: {url}")
 
-        text_content, tables = scrape_page(url)
+        text_content, tables, pdf_links = scrape_page(url)
 
         if text_content:
             save_to_file(f"# Content from {url}\n\n{text_content}")
@@ -173,15 +131,14 @@ def main(sitemap_file):
             for i, table in enumerate(tables, start=1):
                 save_to_file(f"# Table {i} from {url}\n\n{table}")
 
-        pdf_links = extract_pdfs(url)
         if pdf_links:
             logger.info(f"Found {len(pdf_links)} PDFs on {url}. Processing...")
 
             for pdf_url in pdf_links:
                 logger.info(f"Processing PDF: {pdf_url}")
-                markdown_content = convert_pdf_to_markdown(pdf_url)
-                if markdown_content:
-                    save_to_file(f"# Content from PDF: {pdf_url}\n\n{markdown_content}")
+                markdown_path = convert_pdf_to_markdown(pdf_url)
+                if markdown_path:
+                    append_file_to_file(f"# Content from PDF: {pdf_url}\n\n", markdown_path)
                 else:
                     logger.warning(f"Failed to extract Markdown from PDF: {pdf_url}")
 